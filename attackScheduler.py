@@ -0,0 +1,233 @@
+import time
+from collections import namedtuple
+import cipherText
+import coincidence
+import cribDrag
+import dictionarySearch
+import keySearch
+import languageFunctions
+import vigenere
+
+# Seconds an attack may take by default when it is given a time budget
+DEFAULT_BUDGET = 60
+
+# The cost model below was measured on a single core. Estimates only decide the order the stages run in and the
+# expected time left of a running stage, so only their size relative to each other has to be right
+
+# Seconds to try one key with vigenere.evaluate_keys: a fixed part, and a part per letter of the cipher text.
+# The words of the dictionary stage are already consistent with the column statistics, so many get past the staged
+# filter and are checked for English, on at most about LETTERS_CHECKED_PER_KEY letters. The keys of the crib and
+# Kasiski/Babbage stages aren't filtered, so every one of them is checked on the whole text
+SECONDS_PER_KEY = 1e-5
+SECONDS_PER_CHECKED_LETTER = 3e-7
+LETTERS_CHECKED_PER_KEY = 2500
+
+# Seconds to build one key from the ranked letters of its key length, see vigenere.find_keys_for_lengths
+SECONDS_PER_ENUMERATED_KEY = 1e-5
+
+# Seconds to check one dictionary word against the column statistics, see dictionarySearch.feasible_words
+SECONDS_PER_WORD_SCREENED = 1.5e-6
+
+# Seconds one start of keySearch.search_key takes per letter of the cipher text, whatever the key length
+SECONDS_PER_SEARCH_LETTER = 1.5e-3
+
+# Seconds to rank the likely key lengths, see vigenere.find_likely_key_lengths: a fixed part and a part per letter
+ANALYSIS_SECONDS = 0.01
+SECONDS_PER_ANALYSED_LETTER = 3e-6
+
+# Seconds to decipher one letter and score the plaintext, the cost of trying a known or cached key
+SECONDS_PER_DECIPHERED_LETTER = 1e-6
+
+# Seconds to look up the keys of cached messages starting with the same letters
+CACHE_LOOKUP_SECONDS = 0.001
+
+# Seconds to slide one crib letter across one letter of the cipher text, see cribDrag.implied_key_fragments
+SECONDS_PER_DRAGGED_LETTER = 2e-6
+
+# A progress function is called at most once per this many seconds while a stage runs
+PROGRESS_INTERVAL = 1.0
+
+# Expected cost of a stage: the number of keys it tries, None if it doesn't try keys in batches,
+# and the seconds it is expected to take
+StageEstimate = namedtuple("StageEstimate", ["keys", "seconds"])
+
+# State of a running stage handed to progress functions. The total, the rate and the seconds left are None
+# until they are known
+StageProgress = namedtuple("StageProgress", ["stage", "keys_tried", "keys_total", "elapsed", "keys_per_second",
+                                             "seconds_left"])
+
+
+def estimate_dictionary_words(cipher_text, dictionary, plausible_letters=None):
+    """
+    Function estimates how many dictionary words dictionarySearch.candidate_words keeps, without ranking any
+    key letters. A word survives if each of its letters is among the plausible letters of its column, which for
+    a random word happens with a chance of plausible_letters in 26 for every column long enough to be screened.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext of text to be deciphered
+        dictionary: a dictionaryIndex.WordIndex, such as languageFunctions.ENGLISH_DICTIONARY
+        plausible_letters: int, number of letters plausible at each key position,
+            defaults to dictionarySearch.PLAUSIBLE_LETTERS
+
+    Returns:
+        int: the expected number of words tried as keys
+    """
+    if plausible_letters is None:
+        plausible_letters = dictionarySearch.PLAUSIBLE_LETTERS
+    letter_count = len(cipherText.as_ciphertext(cipher_text))
+    expected = 0.0
+
+    for length in dictionary.lengths():
+        screened = sum(1 for position in range(length)
+                       if len(range(position, letter_count, length)) >= dictionarySearch.MIN_COLUMN_LETTERS)
+        expected += dictionary.count_of_length(length) * (plausible_letters / 26) ** screened
+
+    return round(expected)
+
+
+def estimate_stage_costs(cipher_text, stage_names, key_lengths_tried=6, cribs=()):
+    """
+    Function estimates the cost of each stage of an attack from the length of the cipher text, the size of the
+    dictionary and the number of keys each stage tries: the words consistent with the column statistics, the keys
+    implied by the cribs, and the keys find_possible_keys produces for the likely key lengths.
+    Stage names are the ones of batchCrack.stage_candidates. No key lengths are analysed, that is left to the stages
+    under their deadline.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext of text to be deciphered
+        stage_names: an iterable of stage names
+        key_lengths_tried: int, number of likely key lengths the "kasiski" stage tries, defaults to 6
+        cribs: an iterable of strings, the probable words the "crib" stage drags across the text
+
+    Returns:
+        dict: a StageEstimate for every stage name
+    """
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    letter_count = len(cipher_text)
+    analysis_seconds = ANALYSIS_SECONDS + letter_count * SECONDS_PER_ANALYSED_LETTER
+    filtered_key_seconds = SECONDS_PER_KEY + min(letter_count, LETTERS_CHECKED_PER_KEY) * SECONDS_PER_CHECKED_LETTER
+    key_seconds = SECONDS_PER_KEY + letter_count * SECONDS_PER_CHECKED_LETTER
+    estimates = {}
+
+    for stage_name in stage_names:
+        if stage_name == "known_key":
+            estimates[stage_name] = StageEstimate(None, letter_count * SECONDS_PER_DECIPHERED_LETTER)
+
+        elif stage_name == "cached_key":
+            estimates[stage_name] = StageEstimate(None, CACHE_LOOKUP_SECONDS
+                                                  + letter_count * SECONDS_PER_DECIPHERED_LETTER)
+
+        elif stage_name == "crib":
+            # the keys of a crib that is in the text come before the completions of its partial keys, so only
+            # the full keys and the best completion of every partial key are counted
+            crib_letters = sum(len("".join(cribDrag.normalize_crib(crib))) for crib in cribs)
+            keys = len(cribs) * cribDrag.KEY_LENGTHS_TRIED * cribDrag.PARTIAL_KEYS_KEPT
+            estimates[stage_name] = StageEstimate(keys, analysis_seconds + keys * key_seconds
+                                                  + crib_letters * letter_count * SECONDS_PER_DRAGGED_LETTER)
+
+        elif stage_name == "dictionary":
+            dictionary = languageFunctions.ENGLISH_DICTIONARY
+            words = estimate_dictionary_words(cipher_text, dictionary)
+            estimates[stage_name] = StageEstimate(words, analysis_seconds + len(dictionary) * SECONDS_PER_WORD_SCREENED
+                                                  + words * filtered_key_seconds)
+
+        elif stage_name == "kasiski":
+            # which key lengths are tried isn't known before the analysis, so every one is counted with the most keys
+            # find_possible_keys produces. A short text has fewer key lengths that can be scored
+            key_lengths = min(key_lengths_tried, coincidence.longest_scored_key_length(letter_count))
+            keys = key_lengths * vigenere.DEFAULT_MAX_KEYS
+            estimates[stage_name] = StageEstimate(keys, analysis_seconds
+                                                  + keys * (SECONDS_PER_ENUMERATED_KEY + key_seconds))
+
+        elif stage_name == "key_search":
+            # every restart is counted, although the search usually stops early once its best key is confirmed
+            starts = keySearch.KEY_LENGTHS_TRIED * keySearch.DEFAULT_RESTARTS
+            estimates[stage_name] = StageEstimate(None, analysis_seconds
+                                                  + starts * letter_count * SECONDS_PER_SEARCH_LETTER)
+
+        else:
+            raise ValueError("Unknown stage '{}'.".format(stage_name))
+
+    return estimates
+
+
+def order_stages(stage_names, estimates):
+    """
+    Function orders stages cheapest first, so a cheap stage that finds the key saves running the expensive ones.
+    Stages expected to cost the same keep their order.
+
+    Args:
+        stage_names: a list of stage names
+        estimates: dict of StageEstimate tuples returned by estimate_stage_costs
+
+    Returns:
+        list: the stage names, cheapest first
+    """
+    return sorted(stage_names, key=lambda stage_name: estimates[stage_name].seconds)
+
+
+def seconds_left(deadline):
+    """
+    Returns:
+        float: seconds until a time.monotonic() deadline, negative once it has passed, infinite without a deadline
+    """
+    if deadline is None:
+        return float("inf")
+    return deadline - time.monotonic()
+
+
+class ProgressTracker:
+    """
+    Progress function for the attacks of vigenere, which call it with the number of keys tried so far.
+    It works out the throughput and the time left of the stage, and hands them to its callback as a StageProgress,
+    at most once per PROGRESS_INTERVAL seconds and once when every expected key has been tried.
+    """
+
+    def __init__(self, stage, keys_total, callback, interval=PROGRESS_INTERVAL):
+        """
+        Args:
+            stage: string, name of the stage shown to the callback
+            keys_total: int, expected number of keys, None if unknown
+            callback: function taking a StageProgress
+            interval: float, seconds between calls to the callback
+        """
+        self.stage = stage
+        self.keys_total = keys_total
+        self.callback = callback
+        self.interval = interval
+        self.start_time = time.perf_counter()
+        self.last_call_time = self.start_time
+        self.last_keys_tried = 0
+
+    def __call__(self, keys_tried):
+        now = time.perf_counter()
+        # the expected total is only an estimate, so reaching it is reported once even if more keys follow
+        reached_total = self.keys_total is not None and keys_tried >= self.keys_total > self.last_keys_tried
+        self.last_keys_tried = keys_tried
+        if now - self.last_call_time < self.interval and not reached_total:
+            return
+        self.last_call_time = now
+
+        elapsed = now - self.start_time
+        keys_per_second = keys_tried / elapsed if elapsed > 0 else None
+        remaining = None
+        if self.keys_total is not None and keys_per_second:
+            remaining = max(self.keys_total - keys_tried, 0) / keys_per_second
+
+        self.callback(StageProgress(self.stage, keys_tried, self.keys_total, elapsed, keys_per_second, remaining))
+
+
+def print_progress(progress):
+    """
+    Function prints a StageProgress as one line, the default output of the dictionary attack
+    """
+    line = "{}: tried {:,} keys".format(progress.stage.capitalize(), progress.keys_tried)
+    if progress.keys_total:
+        line = "{}: tried {:,} of about {:,} keys ({:.0%})".format(
+            progress.stage.capitalize(), progress.keys_tried, progress.keys_total,
+            min(progress.keys_tried / progress.keys_total, 1))
+    if progress.keys_per_second is not None:
+        line += ", {:,.0f} keys/s".format(progress.keys_per_second)
+    if progress.seconds_left is not None:
+        line += ", about {:.0f}s left".format(progress.seconds_left)
+    print(line)
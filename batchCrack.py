@@ -0,0 +1,482 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import attackScheduler
+import cipherText
+import cribDrag
+import dictionarySearch
+import languageFunctions
+import keySearch
+import metrics
+import multiMessage
+import resultCache
+import stagedFilter
+import vigenere
+
+# A candidate is accepted without trying further keys once its English score reaches this value
+DEFAULT_CONFIDENCE = 0.8
+
+# Number of likely key lengths tried by the Kasiski/Babbage stage
+KEY_LENGTHS_TRIED = 6
+
+# Result cache of each process, opened the first time a message is cracked with it
+_caches = {}
+
+
+def read_directory(path):
+    """
+    Generator reading every .txt file in a directory as a message, in order of file name.
+    A file that can't be read is yielded as a message with only its "id" and an "error", see read_jsonl.
+
+    Args:
+        path: path to the directory
+
+    Yields:
+        dict: a message with an "id" equal to the file name and its "ciphertext"
+    """
+    for file_name in sorted(os.listdir(path)):
+        if not file_name.endswith(".txt"):
+            continue
+        try:
+            with open(os.path.join(path, file_name), "r") as file:
+                cipher_text = file.read()
+        except (OSError, ValueError) as error:
+            yield {"id": file_name, "error": "{}: {}".format(type(error).__name__, error)}
+            continue
+        yield {"id": file_name, "ciphertext": cipher_text}
+
+
+def read_jsonl(file):
+    """
+    Generator reading one message per line of a JSONL stream.
+    Every line must be an object with a "ciphertext", and may have an "id", a known "key" and a list of "cribs",
+    words or phrases expected in the plaintext.
+    Lines without an "id" are numbered from 1, and known keys are upper-cased.
+    A line that isn't a JSON object, or whose key has anything but the letters A to Z, is yielded as a message with
+    only its "id" and an "error" naming the line. It is written out as the result of that message, and the rest of
+    the batch is still cracked.
+
+    Args:
+        file: an open text file
+
+    Yields:
+        dict: the next message
+    """
+    for line_number, line in enumerate(file, start=1):
+        if line.strip() == "":
+            continue
+        message = None
+        try:
+            message = json.loads(line)
+            if not isinstance(message, dict):
+                raise ValueError("expected a JSON object, not {}".format(type(message).__name__))
+            if message.get("key") is not None:
+                message["key"] = normalize_key(message["key"])
+        except ValueError as error:
+            message_id = message.get("id", line_number) if isinstance(message, dict) else line_number
+            yield {"id": message_id, "error": "line {}: {}".format(line_number, error)}
+            continue
+        message.setdefault("id", line_number)
+        yield message
+
+
+def normalize_key(key):
+    """
+    Function checks a known key and upper-cases it
+
+    Args:
+        key: string
+
+    Returns:
+        string: the key in uppercase
+
+    Raises:
+        ValueError: if the key is empty or has anything but the letters A to Z
+    """
+    if not isinstance(key, str) or not key.isascii() or not key.isalpha():
+        raise ValueError("key {!r} can only contain the letters A to Z".format(key))
+    return key.upper()
+
+
+def try_candidates(candidates, spaces, confidence, best):
+    """
+    Function scores key candidates until one reaches the confidence threshold
+
+    Args:
+        candidates: an iterable of (key, plaintext) tuples
+        spaces: bool saying whether the text contains spaces
+        confidence: float, the English score needed to accept a candidate
+        best: dict holding the best candidate found so far, updated in place
+
+    Returns:
+        bool: True if a candidate was accepted
+    """
+    for key, plaintext in candidates:
+        score = languageFunctions.english_score(plaintext, spaces)
+        if score > best["score"]:
+            best.update(key=key, plaintext=plaintext, score=score)
+        if score >= confidence:
+            return True
+
+    return False
+
+
+def stage_candidates(stage_name, cipher_text, spaces, known_key=None, cache=None, deadline=None, progress=None,
+                     cribs=()):
+    """
+    Function starts one stage of the attack
+
+    Args:
+        stage_name: "known_key", "cached_key", "crib", "dictionary", "kasiski" or "key_search"
+        cipher_text: string or cipherText.Ciphertext of text to be deciphered
+        spaces: bool saying whether the text contains spaces
+        known_key: string, the key used by the "known_key" stage
+        cache: optional resultCache.ResultCache, used by the "cached_key" stage and the analysis of the "kasiski" stage
+        deadline: optional time.monotonic() value after which the stage stops producing candidates
+        progress: optional function called with the number of keys tried so far by the "crib", "dictionary"
+            and "kasiski" stages, and with the number of starts finished by the "key_search" stage, see
+            keySearch.search_key. It can stop a stage by raising an exception
+        cribs: an iterable of strings, the probable words used by the "crib" stage
+
+    Returns:
+        an iterable of the (key, plaintext) tuples that the stage considers English
+    """
+    if stage_name == "known_key":
+        known_key = normalize_key(known_key)
+        return [(known_key, vigenere.decipher_vigenere(cipher_text, known_key))]
+
+    if stage_name == "cached_key":
+        return ((key, vigenere.decipher_vigenere(cipher_text, key)) for key in cache.keys_with_prefix(cipher_text))
+
+    if stage_name == "crib":
+        keys = cribDrag.find_crib_keys(cipher_text, cribs)
+        return vigenere.find_english_candidates(cipher_text, keys, spaces, progress=progress, deadline=deadline)
+
+    if stage_name == "dictionary":
+        # the words the column statistics rule out are only tried once the others found no English plaintext
+        words = dictionarySearch.candidate_words(cipher_text, languageFunctions.ENGLISH_DICTIONARY, fallback=True)
+        return vigenere.find_english_candidates(cipher_text, words, spaces, progress=progress,
+                                                stages=stagedFilter.DEFAULT_STAGES, deadline=deadline)
+
+    if stage_name == "key_search":
+        return keySearch.find_key_candidates(cipher_text, deadline=deadline, progress=progress)
+
+    key_lengths = vigenere.find_likely_key_lengths(cipher_text, KEY_LENGTHS_TRIED, use_coincidence=True, cache=cache)
+    possible_keys = vigenere.find_keys_for_lengths(cipher_text, key_lengths, cache=cache)
+    return vigenere.find_english_candidates(cipher_text, possible_keys, spaces, progress=progress, deadline=deadline)
+
+
+def plan_stages(message, use_dictionary=True, cache=None):
+    """
+    Function lists the stages crack_message runs on a message, in order
+
+    Args:
+        message: dict with the "ciphertext", and optionally a known "key" and "cribs"
+        use_dictionary: bool, whether to run the dictionary attack, defaults to True
+        cache: optional resultCache.ResultCache, adds the "cached_key" stage
+
+    Returns:
+        list: stage names, see stage_candidates
+    """
+    stage_names = []
+    if message.get("key"):
+        stage_names.append("known_key")
+    if cache is not None:
+        stage_names.append("cached_key")
+    if message.get("cribs"):
+        stage_names.append("crib")
+    if use_dictionary:
+        stage_names.append("dictionary")
+    stage_names.append("kasiski")
+    stage_names.append("key_search")
+
+    return stage_names
+
+
+def run_stage(stage_name, cipher_text, spaces, confidence, best, known_key=None, cache=None, deadline=None,
+              progress=None, cribs=()):
+    """
+    Function runs one stage of the attack, scoring its candidates until one reaches the confidence threshold
+
+    Args:
+        stage_name: string, see stage_candidates
+        cipher_text: string or cipherText.Ciphertext of text to be deciphered
+        spaces: bool saying whether the text contains spaces
+        confidence: float, the English score needed to accept a candidate
+        best: dict holding the best candidate found so far, updated in place
+        known_key: string, the key used by the "known_key" stage
+        cache: optional resultCache.ResultCache
+        deadline: optional time.monotonic() value after which the stage stops
+        progress: optional function called with the number of keys tried so far, see stage_candidates
+        cribs: an iterable of strings, the probable words used by the "crib" stage
+
+    Returns:
+        bool: True if a candidate was accepted
+    """
+    candidates = stage_candidates(stage_name, cipher_text, spaces, known_key, cache, deadline, progress, cribs)
+    try:
+        return try_candidates(candidates, spaces, confidence, best)
+    finally:
+        if hasattr(candidates, "close"):
+            candidates.close()
+
+
+def crack_message(message, confidence=DEFAULT_CONFIDENCE, use_dictionary=True, cache=None, budget=None,
+                  progress=None):
+    """
+    Function runs the known key, crib, dictionary, Kasiski/Babbage and key search stages on one message without asking
+    the user anything. Stages are skipped once a candidate reaches the confidence threshold.
+    With a cache, a message cracked before is answered from it, and the keys of cracked messages starting
+    with the same letters are tried before the dictionary.
+    With a time budget, the stages run cheapest first by the estimates of attackScheduler.estimate_stage_costs,
+    and the attack stops when the budget runs out, returning the best candidate found so far.
+
+    Args:
+        message: dict with the "ciphertext", and optionally the "id", a known "key" and "cribs"
+        confidence: float, the English score needed to accept a candidate, defaults to DEFAULT_CONFIDENCE
+        use_dictionary: bool, whether to run the dictionary attack, defaults to True
+        cache: optional resultCache.ResultCache accepted results and analysis are stored to
+        budget: optional float, seconds the message may take. By default the stages run in the order of plan_stages
+            until one of them succeeds
+        progress: optional function called with an attackScheduler.StageProgress while a stage tries keys
+
+    Returns:
+        dict: the id, the best key, plaintext and score found, whether the score reached the confidence threshold,
+            the stage that found the key, the seconds spent in each stage and whether the budget ran out
+    """
+    cipher_text = message["ciphertext"]
+    deadline = None if budget is None else time.monotonic() + budget
+
+    if cache is not None:
+        start_time = time.perf_counter()
+        cached = cache.get_result(cipher_text)
+        if cached is not None:
+            return {"id": message.get("id"), "key": cached["key"], "plaintext": cached["plaintext"],
+                    "score": cached["score"], "accepted": True, "stage": "cache",
+                    "timings": {"cache": time.perf_counter() - start_time}, "timed_out": False}
+
+    spaces = languageFunctions.check_for_spaces(cipher_text)
+    # every stage works on the same normalized text
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    best = {"key": None, "plaintext": None, "score": 0}
+    timings = {}
+    accepted = False
+    timed_out = False
+    stage = None
+
+    stage_names = plan_stages(message, use_dictionary, cache)
+    estimates = None
+    if budget is not None or progress is not None:
+        estimates = attackScheduler.estimate_stage_costs(cipher_text, stage_names, KEY_LENGTHS_TRIED,
+                                                         message.get("cribs") or ())
+    if budget is not None:
+        stage_names = attackScheduler.order_stages(stage_names, estimates)
+
+    for stage_name in stage_names:
+        if attackScheduler.seconds_left(deadline) <= 0:
+            timed_out = True
+            break
+
+        stage_progress = None
+        if progress is not None:
+            stage_progress = attackScheduler.ProgressTracker(stage_name, estimates[stage_name].keys, progress)
+
+        start_time = time.perf_counter()
+        best_score = best["score"]
+        accepted = run_stage(stage_name, cipher_text, spaces, confidence, best, message.get("key"), cache, deadline,
+                             stage_progress, message.get("cribs") or ())
+        timings[stage_name] = time.perf_counter() - start_time
+
+        if best["score"] > best_score:
+            stage = stage_name
+        if accepted:
+            break
+
+    if accepted and cache is not None:
+        cache.put_result(cipher_text, best["key"], best["plaintext"], best["score"])
+
+    if not accepted and attackScheduler.seconds_left(deadline) <= 0:
+        timed_out = True
+
+    return {"id": message.get("id"), "key": best["key"], "plaintext": best["plaintext"], "score": best["score"],
+            "accepted": accepted, "stage": stage, "timings": timings, "timed_out": timed_out}
+
+
+def _init_worker(metrics_enabled):
+    """
+    Pool initializer turning metrics on in the worker if they are on in the main process
+    """
+    metrics.ENABLED = metrics_enabled
+
+
+def _crack_with_options(arguments):
+    """
+    Pool task unpacking the arguments of crack_message, and turning errors into results so one bad message
+    doesn't stop the batch. A message that couldn't be read, see read_jsonl, is passed on as its error
+
+    Returns:
+        tuple: the result, and the metrics recorded while cracking the message, None if metrics are turned off
+    """
+    message, confidence, use_dictionary, cache_path, budget = arguments
+    if "error" in message:
+        return error_result(message), None
+    try:
+        cache = None
+        if cache_path is not None:
+            if cache_path not in _caches:
+                _caches[cache_path] = resultCache.ResultCache(cache_path)
+            cache = _caches[cache_path]
+        result = crack_message(message, confidence, use_dictionary, cache, budget)
+    except Exception as error:
+        result = {"id": message.get("id"), "error": "{}: {}".format(type(error).__name__, error)}
+
+    return result, metrics.take() if metrics.ENABLED else None
+
+
+def error_result(message):
+    """
+    Returns:
+        dict: the result of a message that couldn't be read, its "id" and its "error"
+    """
+    return {"id": message.get("id"), "error": message["error"]}
+
+
+def crack_all(messages, output, workers=None, confidence=DEFAULT_CONFIDENCE, use_dictionary=True, cache_path=None,
+              budget=None):
+    """
+    Function cracks messages concurrently across a pool of worker processes, and writes each result
+    as a line of JSON as soon as its message is finished, so results are not in input order.
+    With a single worker the messages are cracked in this process, in order, which makes them easier to profile.
+
+    Args:
+        messages: an iterable of message dicts, see crack_message
+        output: an open text file the results are written to
+        workers: int, number of worker processes, defaults to the number of CPUs
+        confidence: float, the English score needed to accept a candidate
+        use_dictionary: bool, whether to run the dictionary attack
+        cache_path: optional path to the SQLite database of a resultCache.ResultCache shared by the workers
+        budget: optional float, seconds each message may take, see crack_message
+
+    Returns:
+        int: number of messages processed
+    """
+    tasks = ((message, confidence, use_dictionary, cache_path, budget) for message in messages)
+    processed = 0
+
+    if workers == 1:
+        for result, records in map(_crack_with_options, tasks):
+            metrics.merge(records)
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            processed += 1
+        return processed
+
+    with multiprocessing.Pool(workers, _init_worker, (metrics.ENABLED,)) as pool:
+        for result, records in pool.imap_unordered(_crack_with_options, tasks):
+            metrics.merge(records)
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            processed += 1
+
+    return processed
+
+
+def crack_shared_key(messages, output, confidence=DEFAULT_CONFIDENCE):
+    """
+    Function cracks messages that were all enciphered with the same key, each starting at the first letter of the key,
+    as one multiMessage.MessageSet, and writes the result of every message as a line of JSON, in input order
+
+    Args:
+        messages: an iterable of message dicts, see crack_message. Their known keys and cribs are ignored,
+            and messages that couldn't be read are written out as their errors first
+        output: an open text file the results are written to
+        confidence: float, the English score all plaintexts together need to accept the key
+
+    Returns:
+        int: number of messages processed
+    """
+    messages = list(messages)
+    unread = [message for message in messages if "error" in message]
+    for message in unread:
+        output.write(json.dumps(error_result(message)) + "\n")
+    messages = [message for message in messages if "error" not in message]
+
+    start_time = time.perf_counter()
+    message_set = multiMessage.MessageSet(message["ciphertext"] for message in messages)
+    key, plaintexts, score = message_set.crack()
+    timings = {"shared_key": time.perf_counter() - start_time}
+
+    for message, plaintext in zip(messages, plaintexts):
+        spaces = languageFunctions.check_for_spaces(message["ciphertext"])
+        result = {"id": message.get("id"), "key": key, "plaintext": plaintext,
+                  "score": languageFunctions.english_score(plaintext, spaces), "accepted": score >= confidence,
+                  "stage": "shared_key", "timings": timings, "timed_out": False}
+        output.write(json.dumps(result) + "\n")
+    output.flush()
+
+    return len(unread) + len(plaintexts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crack Vigenere encrypted messages in bulk, without prompts.")
+    parser.add_argument("input", help="a directory of .txt cipher texts, a .jsonl file of messages, or - to read "
+                                      "JSONL from standard input")
+    parser.add_argument("-o", "--output", help="JSONL file the results are written to, defaults to standard output")
+    parser.add_argument("-w", "--workers", type=int, help="number of worker processes, defaults to the number of CPUs")
+    parser.add_argument("-c", "--confidence", type=float, default=DEFAULT_CONFIDENCE,
+                        help="English score between 0 and 1 needed to accept a key, defaults to %(default)s")
+    parser.add_argument("--no-dictionary", action="store_true", help="skip the dictionary attack")
+    parser.add_argument("-b", "--budget", type=float,
+                        help="seconds each message may take. Stages then run cheapest first and the best key found "
+                             "so far is returned when the time runs out")
+    parser.add_argument("--same-key", action="store_true",
+                        help="crack all messages together, as messages enciphered with one key that each start at "
+                             "its first letter")
+    parser.add_argument("--cache", help="SQLite file caching cracked keys and key length analysis between runs")
+    parser.add_argument("--metrics", help="file the time spent in each stage and the counters are written to")
+    parser.add_argument("--metrics-format", choices=("json", "prometheus"), default="json",
+                        help="format of the metrics file, defaults to %(default)s")
+    parser.add_argument("--profile", help="file cProfile statistics of this process are written to, "
+                                          "use with -w 1 to profile the cracking itself")
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+
+    # only a file that can't be opened is a usage error, a message that can't be read gets an error result
+    input_file = None
+    try:
+        if args.input == "-":
+            messages = read_jsonl(sys.stdin)
+        elif os.path.isdir(args.input):
+            messages = read_directory(args.input)
+        else:
+            input_file = open(args.input, "r")
+            messages = read_jsonl(input_file)
+        output = open(args.output, "w") if args.output else sys.stdout
+    except OSError as error:
+        parser.error("{}: {}".format(error.filename, error.strerror))
+
+    try:
+        with metrics.profiled(args.profile):
+            if args.same_key:
+                crack_shared_key(messages, output, args.confidence)
+            else:
+                crack_all(messages, output, args.workers, args.confidence, not args.no_dictionary, args.cache,
+                          args.budget)
+    finally:
+        if input_file is not None:
+            input_file.close()
+        if output is not sys.stdout:
+            output.close()
+
+    if args.metrics:
+        with open(args.metrics, "w") as metrics_file:
+            metrics_file.write(metrics.to_prometheus() if args.metrics_format == "prometheus" else metrics.to_json())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import platform
+import random
+import string
+import sys
+import time
+import cipherText
+import languageFunctions
+import vigenere
+
+# Sizes of the generated plaintexts, in characters
+DEFAULT_SIZES = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# Key lengths the plaintexts are encrypted with
+DEFAULT_KEY_LENGTHS = (3, 7, 12)
+
+# A benchmark is a regression if it is this much slower than the baseline
+DEFAULT_THRESHOLD = 0.2
+
+# Benchmarks faster than this in the baseline are not compared, their timings are mostly noise
+MIN_COMPARED_SECONDS = 0.001
+
+# Seed for every random choice, so runs on the same code produce the same inputs
+DEFAULT_SEED = 2018
+
+# English text the synthetic plaintexts are built from
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plaintext.txt")
+
+# Benchmarks that are skipped for inputs longer than this, because a single run would take minutes
+SLOW_BENCHMARK_LIMITS = {
+    "is_english_nospace": 100000,
+    "find_words_in_nospace": 100000,
+    "find_possible_keys": 1000000,
+    "crack": 100000,
+}
+
+
+def load_corpus():
+    """
+    Function loads the English words the synthetic plaintexts are built from.
+    plaintext.txt gives the words a realistic letter distribution, and it is topped up with dictionary words
+    so that the texts don't only repeat a few sentences.
+
+    Returns:
+        tuple: a list of words from plaintext.txt and a list of dictionary words
+    """
+    text_words = []
+    if os.path.exists(CORPUS_PATH):
+        with open(CORPUS_PATH, "r") as file:
+            text_words = languageFunctions.format_for_analysis(file.read()).split()
+    dictionary_words = list(languageFunctions.ENGLISH_DICTIONARY)
+
+    # without plaintext.txt the texts are made of dictionary words only
+    if not text_words:
+        text_words = dictionary_words
+
+    return text_words, dictionary_words
+
+
+def generate_plaintext(corpus, size, rng):
+    """
+    Function builds a spaced English-like plaintext of a given size, three in four words coming from
+    plaintext.txt and the rest from the dictionary
+
+    Args:
+        corpus: tuple returned by load_corpus
+        size: int, number of characters
+        rng: random.Random used for every choice
+
+    Returns:
+        string: uppercase words separated by single spaces
+    """
+    text_words, dictionary_words = corpus
+    words = []
+    length = 0
+
+    while length < size:
+        word = rng.choice(text_words) if rng.random() < 0.75 else rng.choice(dictionary_words)
+        words.append(word)
+        length += len(word) + 1
+
+    return " ".join(words)[:size].strip()
+
+
+def generate_key(key_length, rng):
+    """
+    Function returns a random key of uppercase letters
+    """
+    return "".join(rng.choice(string.ascii_uppercase) for _ in range(key_length))
+
+
+def encipher_vigenere(plaintext, key):
+    """
+    Function enciphers an uppercase plaintext with a key, the inverse of vigenere.decipher_vigenere.
+    Enciphering with a key is deciphering with the key whose letters are shifted the other way.
+    """
+    inverse_key = "".join(string.ascii_uppercase[-string.ascii_uppercase.index(letter) % 26] for letter in key)
+    return vigenere.decipher_vigenere(plaintext, inverse_key)
+
+
+def time_call(function, repeat):
+    """
+    Function runs a function repeat times and returns the fastest run, the least disturbed by other processes
+
+    Returns:
+        tuple: seconds taken by the fastest run, and the value returned by the last run
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start_time
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best, result
+
+
+def crack(cipher_text, spaces):
+    """
+    End to end Kasiski/Babbage attack without prompts, the way main.py runs it.
+    Returns the first key that deciphers the text into English.
+    """
+    cipher_text = cipherText.Ciphertext(cipher_text)
+    key_lengths = vigenere.find_likely_key_lengths(cipher_text, 6, use_coincidence=True)
+    for key, plaintext in vigenere.find_english_candidates(cipher_text,
+                                                           vigenere.find_keys_for_lengths(cipher_text, key_lengths),
+                                                           spaces):
+        return key
+
+    return None
+
+
+def benchmark_cases(plaintext, key):
+    """
+    Function prepares the benchmarks for one plaintext and key
+
+    Returns:
+        list: a list of (benchmark name, function, expected value) tuples. The expected value is the one the function
+            must return to count as correct, or None if what it returns isn't checked
+    """
+    cipher_text = encipher_vigenere(plaintext, key)
+    unspaced_text = plaintext.replace(" ", "")
+    unspaced_cipher_text = cipher_text.replace(" ", "")
+
+    return [
+        ("decipher_vigenere", lambda: vigenere.decipher_vigenere(cipher_text, key), plaintext),
+        ("is_english", lambda: languageFunctions.is_english(plaintext, True), None),
+        ("is_english_nospace", lambda: languageFunctions.is_english(unspaced_text, False), None),
+        ("find_words_in_nospace", lambda: languageFunctions.find_words_in_nospace(unspaced_text), None),
+        ("find_likely_key_lengths", lambda: vigenere.find_likely_key_lengths(cipher_text), None),
+        ("find_possible_keys", lambda: list(vigenere.find_possible_keys(cipher_text, len(key))), None),
+        ("crack", lambda: crack(unspaced_cipher_text, False), key),
+    ]
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, key_lengths=DEFAULT_KEY_LENGTHS, seed=DEFAULT_SEED, repeat=3,
+                   only=None, log=None):
+    """
+    Function times every benchmark on generated plaintexts of every size, encrypted with keys of every length
+
+    Args:
+        sizes: an iterable of ints, plaintext sizes in characters
+        key_lengths: an iterable of ints, lengths of the random keys
+        seed: int, seed for the generated texts and keys
+        repeat: int, how many times each benchmark is run, the fastest run is recorded
+        only: optional collection of benchmark names, the others are skipped
+        log: optional function called with a line of text after each benchmark
+
+    Returns:
+        list: a list of result dicts with the benchmark name, size, key length and seconds. Benchmarks whose
+            result is checked, see benchmark_cases, also have "correct", False when they returned a wrong value
+    """
+    corpus = load_corpus()
+    results = []
+
+    # the word trie is built on first use, which shouldn't be timed as part of the first benchmark
+    languageFunctions.get_word_trie()
+
+    for size in sizes:
+        for key_length in key_lengths:
+            # every size and key length gets its own generator, so adding sizes doesn't change the other inputs
+            rng = random.Random("{}-{}-{}".format(seed, size, key_length))
+            plaintext = generate_plaintext(corpus, size, rng)
+            key = generate_key(key_length, rng)
+
+            for name, function, expected in benchmark_cases(plaintext, key):
+                if only is not None and name not in only:
+                    continue
+                if size > SLOW_BENCHMARK_LIMITS.get(name, size):
+                    continue
+
+                seconds, value = time_call(function, repeat)
+                result = {"name": name, "size": size, "key_length": key_length, "seconds": seconds}
+                # a broken stage would look like a speedup, so the values that can be checked are compared
+                if expected is not None:
+                    result["correct"] = value == expected
+                results.append(result)
+                if log is not None:
+                    log("{:<24} size {:>9} key length {:>3} {:>10.4f}s{}".format(
+                        name, size, key_length, seconds, "" if result.get("correct", True) else " WRONG RESULT"))
+
+    return results
+
+
+def compare_with_baseline(results, baseline_results, threshold=DEFAULT_THRESHOLD):
+    """
+    Function compares benchmark results with a stored baseline
+
+    Args:
+        results: list of result dicts returned by run_benchmarks
+        baseline_results: list of result dicts from an earlier run
+        threshold: float, how much slower than the baseline a benchmark may be, 0.2 meaning 20%
+
+    Returns:
+        list: a list of (result, baseline seconds) tuples, one for every benchmark slower than the threshold allows.
+            Benchmarks that took less than MIN_COMPARED_SECONDS in the baseline are left out
+    """
+    baseline = {(r["name"], r["size"], r["key_length"]): r["seconds"] for r in baseline_results}
+    regressions = []
+
+    for result in results:
+        baseline_seconds = baseline.get((result["name"], result["size"], result["key_length"]))
+        if baseline_seconds is None or baseline_seconds < MIN_COMPARED_SECONDS:
+            continue
+        if result["seconds"] > baseline_seconds * (1 + threshold):
+            regressions.append((result, baseline_seconds))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every cracking stage on generated texts of several sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="plaintext sizes in characters")
+    parser.add_argument("--key-lengths", type=int, nargs="+", default=DEFAULT_KEY_LENGTHS, help="key lengths")
+    parser.add_argument("--only", nargs="+", help="names of the benchmarks to run, by default all of them")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed for the generated texts and keys")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the fastest is recorded")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file the results are written to")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown against the baseline, defaults to %(default)s")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.key_lengths, args.seed, args.repeat, args.only, print)
+
+    with open(args.output, "w") as file:
+        json.dump({"python": platform.python_version(), "machine": platform.machine(), "seed": args.seed,
+                   "results": results}, file, indent=2)
+    print("Results saved to '{}'.".format(args.output))
+
+    wrong_results = [result for result in results if not result.get("correct", True)]
+    for result in wrong_results:
+        print("Wrong result: {} size {} key length {}".format(result["name"], result["size"], result["key_length"]))
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline_results = json.load(file)["results"]
+
+        regressions = compare_with_baseline(results, baseline_results, args.threshold)
+        for result, baseline_seconds in regressions:
+            print("Regression: {} size {} key length {} took {:.4f}s, baseline {:.4f}s".format(
+                result["name"], result["size"], result["key_length"], result["seconds"], baseline_seconds))
+
+        if regressions:
+            sys.exit(1)
+        print("No regressions against '{}'.".format(args.baseline))
+
+    if wrong_results:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
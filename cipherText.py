@@ -0,0 +1,158 @@
+import re
+
+# Everything languageFunctions.format_for_analysis removes from upper-cased text, and everything but letters.
+# Every module normalizing text with a regular expression uses these, which is much faster than
+# format_for_analysis on long texts
+NOT_LETTER_OR_SPACE = re.compile("[^A-Z ]")
+NOT_LETTER = re.compile("[^A-Z]")
+
+
+class Ciphertext:
+    """
+    A cipher text normalized once, the same way as languageFunctions.format_for_analysis, with the views
+    the attacks need worked out on first use and kept.
+    The letters are stored as bytes without spaces, and the spaces as the lengths of the words they divide the
+    letters into, since key letters only advance on letters.
+
+    Every public function of vigenere accepts a Ciphertext wherever it accepts a cipher text string, so one
+    Ciphertext can be passed through a whole attack without the text being normalized again.
+    """
+    __slots__ = ("letters", "word_lengths", "_spaced", "_columns", "_histograms", "_letter_values")
+
+    def __init__(self, text):
+        words = NOT_LETTER_OR_SPACE.sub("", text.upper()).strip().split(" ")
+        self.letters = "".join(words).encode("ascii")
+        self.word_lengths = tuple(len(word) for word in words)
+        self._spaced = None
+        self._columns = {}
+        self._histograms = {}
+        self._letter_values = None
+
+    @classmethod
+    def from_prepared(cls, letters, word_lengths=None):
+        """
+        Function builds a Ciphertext from bytes of uppercase letters and word lengths that are already normalized
+
+        Args:
+            letters: bytes of uppercase letters without spaces
+            word_lengths: optional tuple of word lengths, by default the letters are one word
+        """
+        cipher_text = cls.__new__(cls)
+        cipher_text.letters = bytes(letters)
+        cipher_text.word_lengths = tuple(word_lengths) if word_lengths is not None else (len(letters),)
+        cipher_text._spaced = None
+        cipher_text._columns = {}
+        cipher_text._histograms = {}
+        cipher_text._letter_values = None
+        return cipher_text
+
+    def __len__(self):
+        return len(self.letters)
+
+    def __str__(self):
+        return self.spaced
+
+    def __repr__(self):
+        return "Ciphertext({!r})".format(self.spaced if len(self.spaced) <= 40 else self.spaced[:37] + "...")
+
+    @property
+    def has_spaces(self):
+        return len(self.word_lengths) > 1
+
+    @property
+    def spaced(self):
+        """
+        The normalized text with its spaces, as returned by languageFunctions.format_for_analysis
+        """
+        if self._spaced is None:
+            words = []
+            start = 0
+            for length in self.word_lengths:
+                words.append(self.letters[start:start + length])
+                start += length
+            self._spaced = b" ".join(words).decode("ascii")
+        return self._spaced
+
+    @property
+    def unspaced(self):
+        """
+        The normalized letters without spaces, as returned by languageFunctions.format_for_analysis(text, False)
+        """
+        return self.letters.decode("ascii")
+
+    def columns(self, key_length):
+        """
+        Function splits the letters into the columns enciphered by each position of a key
+
+        Args:
+            key_length: int, length of the key
+
+        Returns:
+            list: bytes of the letters of every column, the first key position first
+        """
+        if key_length not in self._columns:
+            self._columns[key_length] = [self.letters[i::key_length] for i in range(key_length)]
+        return self._columns[key_length]
+
+    def column_histograms(self, key_length):
+        """
+        Function counts the letters of every column, see columns.
+        Every column of a multiple of the key length lies inside one column of the key length, so when the histograms
+        of a multiple are already known they are added up instead of counting the letters again.
+        Working out the longest key lengths first therefore gives the histograms of their divisors almost for free.
+        The histograms are kept and handed to every caller, so they are tuples that no caller can change.
+
+        Returns:
+            tuple: a tuple of 26 letter counts for every column, A first
+        """
+        if key_length not in self._histograms:
+            multiples = [length for length in self._histograms if length % key_length == 0]
+            if multiples:
+                # the shortest multiple has the fewest histograms to add up
+                histograms = fold_histograms(self._histograms[min(multiples)], key_length)
+            else:
+                # the columns are only kept if they were asked for, counting doesn't need a copy of the text to stay
+                columns = self._columns.get(key_length)
+                if columns is None:
+                    columns = [self.letters[i::key_length] for i in range(key_length)]
+                histograms = [[column.count(letter) for letter in range(65, 91)] for column in columns]
+            self._histograms[key_length] = tuple(tuple(histogram) for histogram in histograms)
+        return self._histograms[key_length]
+
+    def letter_values(self):
+        """
+        Returns:
+            list: the value of every letter between 0 and 25
+        """
+        if self._letter_values is None:
+            self._letter_values = [letter - 65 for letter in self.letters]
+        return self._letter_values
+
+
+def fold_histograms(histograms, key_length):
+    """
+    Function adds up the column histograms of a key length into those of one of its divisors
+
+    Args:
+        histograms: a list of 26 letter counts for every column of a multiple of key_length
+        key_length: int, the divisor
+
+    Returns:
+        list: a list of 26 letter counts for every column of key_length
+    """
+    return [[sum(counts) for counts in zip(*histograms[position::key_length])] for position in range(key_length)]
+
+
+def as_ciphertext(cipher_text):
+    """
+    Function returns a Ciphertext unchanged, and normalizes a string into one
+
+    Args:
+        cipher_text: string or Ciphertext
+
+    Returns:
+        Ciphertext
+    """
+    if isinstance(cipher_text, Ciphertext):
+        return cipher_text
+    return Ciphertext(cipher_text)
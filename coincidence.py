@@ -0,0 +1,264 @@
+import string
+import cipherText
+
+# Chance that two letters picked from English text are the same, and the same for uniformly random letters
+ENGLISH_INDEX_OF_COINCIDENCE = 0.0667
+RANDOM_INDEX_OF_COINCIDENCE = 1 / 26
+
+# Longest period that is scored by default
+DEFAULT_MAX_KEY_LENGTH = 40
+
+# Fewest letters every column of a scored key length has. The index of coincidence of a couple of letters is noise,
+# and on short texts such long key lengths outscore the real one
+MIN_COLUMN_LETTERS = 8
+
+# A key length is treated as a multiple of the real key length when one of its divisors scores at least this share
+# of its score above random text. Multiples of the key length split the text into Caesar ciphers too,
+# so they score just as well
+MULTIPLE_TOLERANCE = 0.85
+
+# Constant damping the effect of the top places when rankings are merged
+RANK_MERGE_CONSTANT = 10
+
+# Key lengths whose columns average at least this index of coincidence, halfway between random and English text,
+# read like Caesar ciphers of English. Divisors of the key length score close to random text, however many
+# repeated sequences they divide
+PLAUSIBLE_INDEX_OF_COINCIDENCE = (ENGLISH_INDEX_OF_COINCIDENCE + RANDOM_INDEX_OF_COINCIDENCE) / 2
+
+# Added to the merged score of a plausible key length, more than any merged score of two rankings, 2 / 11
+PLAUSIBLE_BONUS = 1
+
+_UPPERCASE_BYTES = string.ascii_uppercase.encode("ascii")
+
+
+def letter_histogram(letters):
+    """
+    Function counts every letter of the alphabet in a bytes object of uppercase letters
+
+    Args:
+        letters: bytes of uppercase letters
+
+    Returns:
+        list: 26 ints, the count of A first
+    """
+    return [letters.count(letter) for letter in _UPPERCASE_BYTES]
+
+
+def index_of_coincidence(histogram):
+    """
+    Function calculates the index of coincidence of a letter histogram,
+    the chance that two letters picked from the counted text are the same letter
+
+    Args:
+        histogram: a list of 26 letter counts
+
+    Returns:
+        float: index of coincidence, 0 if fewer than two letters were counted
+    """
+    total = sum(histogram)
+    if total < 2:
+        return 0
+
+    return sum(count * (count - 1) for count in histogram) / (total * (total - 1))
+
+
+def average_index_of_coincidence(letters, period):
+    """
+    Function splits the letters into period columns, as a key of that length would,
+    and returns the average index of coincidence of the columns.
+    With the right period every column is a Caesar cipher and scores close to English,
+    with a wrong period the columns mix key letters and score close to random text.
+
+    Args:
+        letters: bytes of uppercase letters
+        period: int, the key length to be tested
+
+    Returns:
+        float: the average index of coincidence of the columns
+    """
+    column_scores = [index_of_coincidence(letter_histogram(letters[i::period])) for i in range(period)]
+    return sum(column_scores) / period
+
+
+def rank_key_lengths(cipher_text, how_many=None, max_key_length=DEFAULT_MAX_KEY_LENGTH):
+    """
+    Function scores every key length from 1 up to max_key_length by the average index of coincidence of its
+    columns, and ranks them. Unlike Kasiski examination this works without repeated sequences,
+    so it still gives a ranking for short cipher texts.
+    Key lengths that look like multiples of a shorter, similarly scoring key length are ranked after all others.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext of text to be analysed
+        how_many: optional int, how many key lengths to return, by default all of them
+        max_key_length: int, the longest key length to be scored
+
+    Returns:
+        list: a list of (key length, score) tuples, the most likely key length first.
+            The score is the average index of coincidence of the columns
+    """
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    # the histograms are kept by the Ciphertext for ranking the key letters of the likely lengths afterwards
+    scores = score_key_lengths(cipher_text.column_histograms, longest_scored_key_length(len(cipher_text),
+                                                                                      max_key_length))
+
+    return rank_scores(scores, how_many)
+
+
+def longest_scored_key_length(letter_count, max_key_length=DEFAULT_MAX_KEY_LENGTH):
+    """
+    Function returns the longest key length whose columns have at least MIN_COLUMN_LETTERS letters each,
+    up to max_key_length. Key length 1 is always scored
+
+    Args:
+        letter_count: int, the number of letters of the text
+        max_key_length: int, the longest key length to be scored
+
+    Returns:
+        int: the longest key length to be scored
+    """
+    return min(max_key_length, max(letter_count // MIN_COLUMN_LETTERS, 1))
+
+
+def score_key_lengths(column_histograms, max_key_length=DEFAULT_MAX_KEY_LENGTH):
+    """
+    Function scores every key length from 1 up to max_key_length by the average index of coincidence of its columns.
+    The longest key lengths are asked for first, so the histograms of the shorter ones can be added up from those of
+    their multiples, see cipherText.Ciphertext.column_histograms.
+
+    Args:
+        column_histograms: function returning the letter histograms of the columns of a key length, such as
+            cipherText.Ciphertext.column_histograms
+        max_key_length: int, the longest key length to be scored
+
+    Returns:
+        dict: key lengths and the average index of coincidence of their columns
+    """
+    scores = {}
+    for key_length in range(max_key_length, 0, -1):
+        histograms = column_histograms(key_length)
+        scores[key_length] = sum(index_of_coincidence(histogram) for histogram in histograms) / key_length
+
+    return scores
+
+
+def rank_scores(scores, how_many=None):
+    """
+    Function ranks key lengths by their average index of coincidence, see rank_key_lengths.
+    The order is by score except for key lengths that look like multiples of a shorter one, see MULTIPLE_TOLERANCE,
+    which come after every other length however well they score
+
+    Args:
+        scores: dict of key lengths and the average index of coincidence of their columns
+        how_many: optional int, how many key lengths to return, by default all of them
+
+    Returns:
+        list: a list of (key length, score) tuples, the most likely key length first
+    """
+    multiples = find_multiples(scores)
+
+    # sort by score in descending order, multiples last and shorter key lengths first in case of ties
+    ranking = sorted(scores.items(), key=lambda t: (t[0] in multiples, -t[1], t[0]))
+
+    if how_many is not None:
+        ranking = ranking[:how_many]
+
+    return ranking
+
+
+def find_multiples(scores):
+    """
+    Function finds the key lengths that look like multiples of a shorter key length, because one of their divisors
+    scores at least MULTIPLE_TOLERANCE of their score above random text
+
+    Args:
+        scores: dict of key lengths and the average index of coincidence of their columns
+
+    Returns:
+        set: the key lengths that look like multiples
+    """
+    multiples = set()
+    for key_length in scores:
+        for divisor in range(2, key_length // 2 + 1):
+            if key_length % divisor == 0 and scores[divisor] - RANDOM_INDEX_OF_COINCIDENCE >= \
+                    MULTIPLE_TOLERANCE * (scores[key_length] - RANDOM_INDEX_OF_COINCIDENCE):
+                multiples.add(key_length)
+                break
+
+    return multiples
+
+
+def promote_plausible(ranking, scores):
+    """
+    Function moves the key lengths whose columns read like English, see PLAUSIBLE_INDEX_OF_COINCIDENCE, ahead of
+    the others by adding PLAUSIBLE_BONUS to their score, keeping the order within both groups. Multiples of a
+    shorter key length, see find_multiples, read like English as well and are not moved. No key length is dropped,
+    a short text whose columns are too short to tell only has its right key length tried later.
+
+    Args:
+        ranking: a list of (key length, score) tuples sorted by score, such as one returned by merge_rankings
+        scores: dict of key lengths and the average index of coincidence of their columns
+
+    Returns:
+        list: the reordered ranking, still sorted by score
+    """
+    multiples = find_multiples(scores)
+    ranking = [(key_length, score + PLAUSIBLE_BONUS)
+               if scores.get(key_length, 0) >= PLAUSIBLE_INDEX_OF_COINCIDENCE and key_length not in multiples
+               else (key_length, score) for key_length, score in ranking]
+
+    return sorted(ranking, key=lambda t: (-t[1], t[0]))
+
+
+def merge_with_kasiski(kasiski_ranking, scores, how_many=None):
+    """
+    Function ranks key lengths by both Kasiski examination and the index of coincidence, as
+    vigenere.find_likely_key_lengths does with use_coincidence: the two rankings are merged, see merge_rankings,
+    and the lengths whose columns read like English are moved first, see promote_plausible.
+    Kasiski examination favours short divisors of the key length, which divide as many spacings. Their columns
+    don't read like English though, so they are tried after the lengths whose columns do, other than multiples.
+
+    Args:
+        kasiski_ranking: a list of (key length, score) tuples, such as one returned by kasiski.rank_key_lengths
+        scores: dict of key lengths and the average index of coincidence of their columns, see score_key_lengths
+        how_many: optional int, how many key lengths to return, by default all of them
+
+    Returns:
+        list: a list of (key length, merged score) tuples, the most likely key length first. The merged score of
+            a length promoted by promote_plausible includes PLAUSIBLE_BONUS
+    """
+    ranking = promote_plausible(merge_rankings(kasiski_ranking, rank_scores(scores)), scores)
+
+    if how_many is not None:
+        ranking = ranking[:how_many]
+
+    return ranking
+
+
+def merge_rankings(*rankings, how_many=None):
+    """
+    Function merges several key length rankings, such as those of kasiski.rank_key_lengths and rank_key_lengths,
+    into one. Each key length gets 1 / (RANK_MERGE_CONSTANT + place) from every ranking it appears in,
+    so lengths ranked well by all of them come first. The scores of different rankings don't need to be comparable.
+    The merged order is by these reciprocal ranks only, the scores of the rankings are ignored: with a constant of 10
+    a length ranked third by both rankings (2 / 13) comes before one ranked first by a single ranking (1 / 11),
+    however many more Kasiski spacings it divides. Ties go to the shorter key length.
+
+    Args:
+        rankings: lists of (key length, score) tuples, each sorted with the most likely key length first
+        how_many: optional int, how many key lengths to return, by default all of them
+
+    Returns:
+        list: a list of (key length, merged score) tuples, the most likely key length first
+    """
+    merged_scores = {}
+
+    for ranking in rankings:
+        for place, (key_length, score) in enumerate(ranking, start=1):
+            merged_scores[key_length] = merged_scores.get(key_length, 0) + 1 / (RANK_MERGE_CONSTANT + place)
+
+    ranking = sorted(merged_scores.items(), key=lambda t: (-t[1], t[0]))
+
+    if how_many is not None:
+        ranking = ranking[:how_many]
+
+    return ranking
@@ -0,0 +1,383 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+import attackScheduler
+import batchCrack
+import cipherText
+import languageFunctions
+import ngramFitness
+import vigenere
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Seconds a crack request may take by default. Requests can ask for less or more with a "timeout" field
+DEFAULT_TIMEOUT = 60
+
+# Requests allowed to wait for or use a worker at once, per worker. Once the service is this busy it stops
+# reading requests, so callers are slowed down by the socket instead of filling the service's memory
+PENDING_PER_WORKER = 2
+
+# Longest request line accepted, in bytes
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+
+# Seconds between checks for progress updates sent by the worker running a stage
+PROGRESS_POLL_INTERVAL = 0.25
+
+# Seconds a stage is given after its request's deadline to stop and hand back the best key it found. A stage that
+# takes longer is left to stop in its worker, and the request is answered without it
+STOP_GRACE_PERIOD = 2
+
+
+class RequestError(ValueError):
+    """
+    A request the service can't handle as it was sent, answered with a status of 400
+    """
+
+
+class StageCancelled(Exception):
+    """
+    Raised inside a worker to stop a stage once its request has timed out or its caller has gone away
+    """
+
+
+def _warm_up():
+    """
+    Process pool initializer loading the dictionary index, the word trie and the n-gram table,
+    so that every request a worker handles finds them ready
+    """
+    len(languageFunctions.ENGLISH_DICTIONARY)
+    languageFunctions.get_word_trie()
+    ngramFitness.get_table()
+
+
+def _plan_stages(message, use_dictionary):
+    """
+    Pool task listing the stages of batchCrack's attack on a message, cheapest first, see attackScheduler
+
+    Returns:
+        list: (stage name, expected number of keys) tuples, the number being None if the stage doesn't try keys
+    """
+    stage_names = batchCrack.plan_stages(message, use_dictionary)
+    estimates = attackScheduler.estimate_stage_costs(message["ciphertext"], stage_names, batchCrack.KEY_LENGTHS_TRIED,
+                                                     cribs=message.get("cribs") or ())
+    return [(stage_name, estimates[stage_name].keys)
+            for stage_name in attackScheduler.order_stages(stage_names, estimates)]
+
+
+def _run_stage(message, stage_name, confidence, best, deadline, keys_total=None, updates=None, stop=None):
+    """
+    Pool task running one stage of batchCrack's attack on a message until a deadline.
+    The deadline is a time.monotonic() value of the service process, which uses the same clock, so the time
+    the task waited for a worker counts against it too.
+    While the stage runs, its progress is put on the updates queue as dicts of attackScheduler.StageProgress
+    fields, and the stage is stopped at its next progress call once the stop event is set: after the key being
+    checked, or within PROGRESS_STEPS key changes of keySearch.
+
+    Returns:
+        tuple: whether a candidate was accepted, and the best candidate found so far
+    """
+    tracker = None
+    if updates is not None:
+        tracker = attackScheduler.ProgressTracker(stage_name, keys_total, lambda update: updates.put(update._asdict()))
+
+    def progress(keys_tried):
+        if stop is not None and stop.is_set():
+            raise StageCancelled()
+        if tracker is not None:
+            tracker(keys_tried)
+
+    spaces = languageFunctions.check_for_spaces(message["ciphertext"])
+    try:
+        accepted = batchCrack.run_stage(stage_name, message["ciphertext"], spaces, confidence, best, message.get("key"),
+                                        deadline=deadline, progress=progress, cribs=message.get("cribs") or ())
+    except StageCancelled:
+        accepted = False
+    return accepted, best
+
+
+def _decrypt(cipher_text, key, deadline):
+    """
+    Pool task deciphering a cipher text with a known key, vigenere.STREAM_CHUNK_SIZE letters at a time, so it stops
+    in its worker once the time.monotonic() deadline passes, the same way a stage does
+
+    Raises:
+        TimeoutError: if the deadline passes before every letter is deciphered
+    """
+    cipher_text = cipherText.Ciphertext(cipher_text)
+    key = key.upper()
+    chunks = []
+    for start in range(0, len(cipher_text), vigenere.STREAM_CHUNK_SIZE):
+        if time.monotonic() >= deadline:
+            raise TimeoutError()
+        # the key position carries over from one chunk to the next
+        offset = start % len(key)
+        chunks.append(vigenere.decipher_letters(cipher_text.letters[start:start + vigenere.STREAM_CHUNK_SIZE],
+                                                key[offset:] + key[:offset]))
+    return vigenere.restore_spaces(b"".join(chunks), cipher_text.word_lengths)
+
+
+class CrackService:
+    """
+    Local service cracking and deciphering messages sent as lines of JSON over TCP.
+    The dictionary and scoring tables are loaded once by every worker process, which then serves
+    any number of requests, so small requests don't pay the start up cost of a new process.
+
+    Every request line is an object with an "action" of "crack" or "decrypt", a "ciphertext", and optionally
+    an "id" echoed in every reply, a known "key", a list of "cribs" expected in the plaintext, a "confidence" and
+    a "timeout" in seconds.
+    Replies are lines of JSON too: "stage_progress" events with the keys tried, the throughput and the expected
+    time left while a stage of a crack runs, a "progress" event after every stage, and then a "result" or
+    an "error" event. A crack that runs out of time is answered with the best key found so far and
+    "timed_out": true, like batchCrack with a budget. Errors carry a "status" of 400 for a malformed request,
+    408 for a decrypt request that timed out and 500 for anything else. Requests on one connection are handled concurrently, so replies to
+    different requests can be interleaved and should be matched by id.
+    """
+
+    def __init__(self, workers=None, timeout=DEFAULT_TIMEOUT, use_dictionary=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.use_dictionary = use_dictionary
+        self.executor = None
+        self.manager = None
+        self.slots = None
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Function starts the worker processes, waits until all of them are warmed up, then starts the server
+
+        Returns:
+            asyncio.Server: the listening server
+        """
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_warm_up)
+        # progress queues and stop events shared with the workers
+        self.manager = multiprocessing.Manager()
+        self.slots = asyncio.Semaphore(self.workers * PENDING_PER_WORKER)
+
+        # the pool only starts a process when a task is waiting for one, so every worker is given a task
+        await asyncio.gather(*(self.run_in_pool(len, "") for _ in range(self.workers)))
+
+        return await asyncio.start_server(self.handle_connection, host, port, limit=MAX_REQUEST_SIZE)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.manager is not None:
+            self.manager.shutdown()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Reads requests from a connection until it closes, handling each one in its own task
+        """
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(event):
+            async with write_lock:
+                writer.write((json.dumps(event) + "\n").encode("utf-8"))
+                await writer.drain()
+
+        try:
+            while True:
+                # wait for a free slot before reading, which is what pushes back on a caller sending too much
+                await self.slots.acquire()
+                try:
+                    line = await reader.readline()
+                except BaseException:
+                    self.slots.release()
+                    raise
+                if not line:
+                    self.slots.release()
+                    break
+
+                task = asyncio.create_task(self.handle_request(line, send))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                task.add_done_callback(lambda _: self.slots.release())
+
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, ValueError):
+            # the caller went away, or sent a line longer than MAX_REQUEST_SIZE
+            for task in tasks:
+                task.cancel()
+        finally:
+            writer.close()
+
+    async def handle_request(self, line, send):
+        """
+        Handles one request line, sending its events with send
+        """
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise RequestError("Request is not valid JSON.")
+            if not isinstance(request, dict):
+                raise RequestError("Request must be a JSON object.")
+            request_id = request.get("id")
+            action = request.get("action", "crack")
+            validate_request(request, action)
+            deadline = time.monotonic() + float(request.get("timeout", self.timeout))
+
+            if action == "decrypt":
+                key = request["key"]
+                plaintext = await self.run_in_pool(_decrypt, request["ciphertext"], key, deadline)
+                await send({"id": request_id, "event": "result", "key": key.upper(), "plaintext": plaintext})
+            else:
+                await self.crack(request, send, deadline)
+        except TimeoutError:
+            await send({"id": request_id, "event": "error", "status": 408, "error": "Timed out."})
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except RequestError as error:
+            await send({"id": request_id, "event": "error", "status": 400, "error": str(error)})
+        except Exception as error:
+            await send({"id": request_id, "event": "error", "status": 500,
+                        "error": "{}: {}".format(type(error).__name__, error)})
+
+    def run_in_pool(self, function, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def forward_progress(self, request_id, updates, send):
+        """
+        Sends every progress update a worker has put on the updates queue as a "stage_progress" event
+        """
+        while True:
+            try:
+                update = updates.get_nowait()
+            except queue.Empty:
+                return
+            await send(dict(update, id=request_id, event="stage_progress"))
+
+    async def crack(self, request, send, deadline):
+        """
+        Runs the stages of batchCrack.crack_message cheapest first, one pool task at a time, forwarding the progress
+        of the running stage and sending a progress event after each.
+        Every stage is given the deadline of the request. When it passes, the running stage is told to stop and
+        given STOP_GRACE_PERIOD seconds to hand back the best key it found, no further stage is started, and the best
+        key so far is sent with "timed_out": true. If the request is cancelled because its caller went away,
+        the running stage is told to stop as well, so it doesn't keep its worker busy.
+        """
+        key = request.get("key")
+        message = {"ciphertext": request["ciphertext"], "key": key.upper() if key else None,
+                   "cribs": request.get("cribs")}
+        confidence = float(request.get("confidence", batchCrack.DEFAULT_CONFIDENCE))
+        best = {"key": None, "plaintext": None, "score": 0}
+        accepted = False
+        timed_out = False
+        stage = None
+        updates = self.manager.Queue()
+        stop = self.manager.Event()
+        future = None
+
+        try:
+            for stage_name, keys_total in await self.run_in_pool(_plan_stages, message, self.use_dictionary):
+                if attackScheduler.seconds_left(deadline) <= 0:
+                    timed_out = True
+                    break
+
+                start_time = time.perf_counter()
+                best_score = best["score"]
+                future = self.run_in_pool(_run_stage, message, stage_name, confidence, best, deadline, keys_total,
+                                          updates, stop)
+                while True:
+                    done, pending = await asyncio.wait({future}, timeout=PROGRESS_POLL_INTERVAL)
+                    await self.forward_progress(request.get("id"), updates, send)
+                    if done:
+                        break
+                    # a stage checks the deadline itself, the stop event also reaches the parts that don't
+                    if attackScheduler.seconds_left(deadline) <= 0:
+                        stop.set()
+                        if attackScheduler.seconds_left(deadline) <= -STOP_GRACE_PERIOD:
+                            break
+                if not future.done():
+                    timed_out = True
+                    break
+                accepted, best = future.result()
+                if best["score"] > best_score:
+                    stage = stage_name
+
+                await send({"id": request.get("id"), "event": "progress", "stage": stage_name,
+                            "seconds": time.perf_counter() - start_time, "best_key": best["key"],
+                            "best_score": best["score"]})
+                if accepted:
+                    break
+        finally:
+            if future is not None and not future.done():
+                future.cancel()
+                stop.set()
+
+        if not accepted and attackScheduler.seconds_left(deadline) <= 0:
+            timed_out = True
+
+        await send({"id": request.get("id"), "event": "result", "key": best["key"], "plaintext": best["plaintext"],
+                    "score": best["score"], "accepted": accepted, "stage": stage, "timed_out": timed_out})
+
+
+def validate_request(request, action):
+    """
+    Function checks the fields of a request
+
+    Args:
+        request: dict decoded from a request line
+        action: string, the action of the request
+
+    Raises:
+        RequestError: if a field is missing or has the wrong type
+    """
+    if action not in ("crack", "decrypt"):
+        raise RequestError("Unknown action '{}'.".format(action))
+    if not isinstance(request.get("ciphertext"), str):
+        raise RequestError("Request has no ciphertext.")
+
+    key = request.get("key")
+    if (action == "decrypt" or key is not None) and \
+            (not isinstance(key, str) or not key.isascii() or not key.isalpha()):
+        raise RequestError("Key can only contain the letters A to Z.")
+
+    cribs = request.get("cribs")
+    if cribs is not None and (not isinstance(cribs, list) or not all(isinstance(crib, str) for crib in cribs)):
+        raise RequestError("Cribs must be a list of strings.")
+
+    for field in ("timeout", "confidence"):
+        value = request.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise RequestError("{} must be a number.".format(field.capitalize()))
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, timeout=DEFAULT_TIMEOUT, use_dictionary=True):
+    service = CrackService(workers, timeout, use_dictionary)
+    server = await service.start(host, port)
+    print("Listening on {}:{} with {} workers.".format(host, port, service.workers), flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve crack and decrypt requests as lines of JSON over TCP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on, defaults to %(default)s")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on, defaults to %(default)s")
+    parser.add_argument("-w", "--workers", type=int, help="number of worker processes, defaults to the number of CPUs")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="seconds a request may take unless it asks otherwise, defaults to %(default)s")
+    parser.add_argument("--no-dictionary", action="store_true", help="skip the dictionary attack")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.timeout, not args.no_dictionary))
+    except KeyboardInterrupt:
+        print("Closing service.")
+
+
+if __name__ == "__main__":
+    main()
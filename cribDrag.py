@@ -0,0 +1,206 @@
+import heapq
+import cipherText
+import vigenere
+
+# Number of likely key lengths, see vigenere.find_likely_key_lengths, that cribs shorter than the key are tried with
+KEY_LENGTHS_TRIED = 6
+
+# A crib longer than the key implies some key letters twice, so at the right offset the letters it implies repeat
+# with the period of the key. Key lengths that aren't among the likely ones are only trusted when at least this many
+# letters repeat, which a wrong offset does with a chance of 1 in 26 ** MIN_REPEATED_LETTERS
+MIN_REPEATED_LETTERS = 3
+
+# A crib shorter than the key only gives part of it. The offsets whose key letters best fit the letter statistics
+# of their columns are kept for every key length
+PARTIAL_KEYS_KEPT = 10
+
+# Number of keys every partial key is completed into, the most likely letters of the unknown positions first
+COMPLETIONS_PER_PARTIAL_KEY = 10
+
+
+def normalize_crib(crib):
+    """
+    Function normalizes a probable word or phrase the same way as cipher texts
+
+    Args:
+        crib: string
+
+    Returns:
+        tuple: the uppercase words of the crib
+    """
+    # the same characters are removed as from cipher texts
+    return tuple(cipherText.NOT_LETTER_OR_SPACE.sub("", crib.upper()).split())
+
+
+def crib_offsets(cipher_text, crib_words):
+    """
+    Function lists the offsets a crib can start at in a cipher text with spaces: the starts of words followed by words
+    as long as the crib's
+
+    Args:
+        cipher_text: cipherText.Ciphertext
+        crib_words: tuple of words returned by normalize_crib
+
+    Returns:
+        list: offsets into the letters of the cipher text, None if the cipher text has no spaces and a crib
+            can start anywhere
+    """
+    if not cipher_text.has_spaces:
+        return None
+
+    crib_lengths = [len(word) for word in crib_words]
+    word_starts = []
+    word_lengths = []
+    start = 0
+    for length in cipher_text.word_lengths:
+        # several spaces in a row leave empty words, which don't separate anything
+        if length > 0:
+            word_starts.append(start)
+            word_lengths.append(length)
+        start += length
+
+    return [word_starts[i] for i in range(len(word_starts) - len(crib_lengths) + 1)
+            if word_lengths[i:i + len(crib_lengths)] == crib_lengths]
+
+
+def implied_key_fragments(cipher_text, crib):
+    """
+    Function slides a crib across the cipher text and works out the key letters it implies at every offset.
+    Subtracting a crib letter from every letter of the cipher text is deciphering the text with that letter,
+    so each crib letter takes a single bytes.translate over the whole text, and the key fragment of an offset
+    is read across the results.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext
+        crib: string of probable plaintext
+
+    Returns:
+        list: (offset, fragment) tuples, the fragment being the string of key letters implied by the crib
+            at that offset of the letters
+    """
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    crib_words = normalize_crib(crib)
+    crib_letters = "".join(crib_words)
+    letters = cipher_text.letters
+    offset_total = len(letters) - len(crib_letters) + 1
+    if not crib_letters or offset_total < 1:
+        return []
+
+    # shifted[j][i] is the key letter that puts the crib's letter j at letter i + j of the text
+    shifted = [letters[j:j + offset_total].translate(vigenere.DECIPHER_TABLES[crib_letter])
+               for j, crib_letter in enumerate(crib_letters)]
+
+    offsets = crib_offsets(cipher_text, crib_words)
+    if offsets is None:
+        return [(offset, fragment.decode("ascii")) for offset, fragment in enumerate(map(bytes, zip(*shifted)))]
+    return [(offset, bytes(column[offset] for column in shifted).decode("ascii")) for offset in offsets]
+
+
+def fragment_letters(fragment, offset, key_length):
+    """
+    Function places the letters of a key fragment at their key positions
+
+    Args:
+        fragment: string of key letters implied by a crib
+        offset: int, offset of the crib in the letters of the cipher text
+        key_length: int, length of the key
+
+    Returns:
+        dict: the key letter of every position the fragment covers
+    """
+    return {(offset + j) % key_length: letter for j, letter in enumerate(fragment[:key_length])}
+
+
+def _letter_costs(ranked_letters):
+    """
+    Function scores every letter of every key position by how much less likely than the best letter of the position
+    it is
+
+    Args:
+        ranked_letters: list returned by vigenere.rank_key_letters
+
+    Returns:
+        list: a dict of letter costs for every key position, 0 for the best letter
+    """
+    costs = []
+    for position_letters in ranked_letters:
+        best_score = position_letters[0][1]
+        costs.append({letter: score - best_score for letter, score in position_letters})
+    return costs
+
+
+def find_crib_keys(cipher_text, cribs, how_many=KEY_LENGTHS_TRIED):
+    """
+    Generator yielding keys derived from probable words of the plaintext, most likely first.
+    A crib at least as long as the key implies the whole key at its offset, and the right offsets are the ones where
+    the implied letters repeat with the period of the key, so those keys come first, the most repeated letters first.
+    A crib shorter than the key implies part of it, at the offsets whose letters best fit the column statistics,
+    and the rest of the key is filled in from the most likely letters of each column, see vigenere.enumerate_keys.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext to be deciphered
+        cribs: an iterable of strings, each a word or phrase expected in the plaintext. In a text with spaces
+            they are only tried as whole words
+        how_many: int, number of likely key lengths that partial keys are built for, defaults to KEY_LENGTHS_TRIED
+
+    Yields:
+        string: the next key, each one once. A key repeating a shorter key is reduced to it, see
+            vigenere.minimal_period
+    """
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    likely_lengths = vigenere.find_likely_key_lengths(cipher_text, how_many, use_coincidence=True)
+    # the letter rankings of every key length are worked out once, for all cribs and offsets
+    rankings = {}
+    letter_costs = {}
+    full_keys = []
+    partial_keys = []
+
+    def costs_of(key_length):
+        if key_length not in letter_costs:
+            rankings[key_length] = vigenere.rank_key_letters(cipher_text, key_length)
+            letter_costs[key_length] = _letter_costs(rankings[key_length])
+        return letter_costs[key_length]
+
+    for crib in cribs:
+        fragments = implied_key_fragments(cipher_text, crib)
+        crib_length = len("".join(normalize_crib(crib)))
+
+        # keys shorter than the crib: only offsets where the implied letters repeat with the key's period
+        for key_length in range(1, crib_length):
+            repeated = crib_length - key_length
+            if key_length not in likely_lengths and repeated < MIN_REPEATED_LETTERS:
+                continue
+            for offset, fragment in fragments:
+                if fragment[key_length:] == fragment[:-key_length]:
+                    known = fragment_letters(fragment, offset, key_length)
+                    key = "".join(known[position] for position in range(key_length))
+                    cost = sum(costs_of(key_length)[position][letter] for position, letter in known.items())
+                    full_keys.append((-repeated, cost, key))
+
+        # likely keys at least as long as the crib: the offsets that fit the column statistics best
+        for key_length in likely_lengths:
+            if key_length < crib_length:
+                continue
+            costs = costs_of(key_length)
+            scored = ((sum(costs[position][letter] for position, letter in known.items()), key_length, known)
+                      for known in (fragment_letters(fragment, offset, key_length) for offset, fragment in fragments))
+            partial_keys.extend(heapq.nsmallest(PARTIAL_KEYS_KEPT, scored, key=lambda entry: entry[0]))
+
+    yielded = set()
+    for repeated, cost, key in sorted(full_keys):
+        key = vigenere.minimal_period(key)
+        if key not in yielded:
+            yielded.add(key)
+            yield key
+
+    partial_keys.sort(key=lambda entry: entry[0])
+    for cost, key_length, known in partial_keys:
+        # the known positions get their crib letter as their only choice
+        ranked_letters = list(rankings[key_length])
+        for position, letter in known.items():
+            ranked_letters[position] = [(letter, 0)]
+        for key in vigenere.enumerate_keys(ranked_letters, COMPLETIONS_PER_PARTIAL_KEY):
+            key = vigenere.minimal_period(key)
+            if key not in yielded:
+                yielded.add(key)
+                yield key
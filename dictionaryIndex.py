@@ -0,0 +1,272 @@
+import mmap
+import os
+import struct
+from bisect import bisect_right
+
+# The index starts with a header holding a magic string, the size and modification time of the source word list,
+# and the number of length buckets. A (length, offset, count) entry follows for every bucket.
+# Each bucket stores its words sorted, at a fixed width equal to their length, so no separators are needed.
+# The index ends with the order of the words in the word list: the number of every word, counting through
+# the buckets from the shortest words, in the order the words first appear in the list
+MAGIC = b"VCIDX002"
+HEADER_FORMAT = "<8sqqI"
+BUCKET_FORMAT = "<III"
+ORDER_FORMAT = "<I"
+
+# Every this many words of a bucket, a word is kept in memory to narrow down a lookup to one block of the mapped
+# bucket, which is then searched as a whole
+FENCE_STEP = 16
+
+
+class _Bucket:
+    """
+    Read-only sequence view of one length bucket
+    """
+    __slots__ = ("data", "offset", "width", "count", "_fences")
+
+    def __init__(self, data, offset, width, count):
+        self.data = data
+        self.offset = offset
+        self.width = width
+        self.count = count
+        self._fences = None
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        start = self.offset + i * self.width
+        return self.data[start:start + self.width]
+
+    def __contains__(self, word):
+        # the words of a bucket are sorted, so the first word of every block of FENCE_STEP words tells which block
+        # a word can be in
+        if self._fences is None:
+            self._fences = [self[i] for i in range(0, self.count, FENCE_STEP)]
+        block = bisect_right(self._fences, word) - 1
+        if block < 0:
+            return False
+
+        block_size = FENCE_STEP * self.width
+        start = self.offset + block * block_size
+        words = self.data[start:min(start + block_size, self.offset + self.count * self.width)]
+        # a match has to start at a word, not span two of them
+        position = words.find(word)
+        while position > 0 and position % self.width:
+            position = words.find(word, position + 1)
+        return position != -1
+
+
+def compile_index(source_path):
+    """
+    Function compiles a whitespace separated word list into the contents of an index file.
+
+    Args:
+        source_path: path to the word list, such as dictionary.txt
+
+    Returns:
+        bytes: contents of the index
+    """
+    source_stat = os.stat(source_path)
+    with open(source_path, "rb") as source_file:
+        # duplicates are dropped, the first appearance of every word keeps its place
+        words = list(dict.fromkeys(source_file.read().split()))
+
+    buckets = {}
+    for word in words:
+        buckets.setdefault(len(word), []).append(word)
+
+    lengths = sorted(buckets)
+    header = struct.pack(HEADER_FORMAT, MAGIC, source_stat.st_size, source_stat.st_mtime_ns, len(lengths))
+    offset = len(header) + struct.calcsize(BUCKET_FORMAT) * len(lengths)
+
+    bucket_table = []
+    bucket_data = []
+    word_numbers = {}
+    for length in lengths:
+        bucket_words = sorted(buckets[length])
+        bucket_table.append(struct.pack(BUCKET_FORMAT, length, offset, len(bucket_words)))
+        bucket_data.append(b"".join(bucket_words))
+        offset += length * len(bucket_words)
+        for word in bucket_words:
+            word_numbers[word] = len(word_numbers)
+
+    order = b"".join(struct.pack(ORDER_FORMAT, word_numbers[word]) for word in words)
+    return header + b"".join(bucket_table) + b"".join(bucket_data) + order
+
+
+def write_index(contents, index_path):
+    """
+    Function writes a compiled index to disk.
+    The file is written under a temporary name and then moved into place, so readers never see half an index.
+
+    Args:
+        contents: bytes returned by compile_index
+        index_path: path of the index file to be written
+    """
+    temporary_path = "{}.{}.tmp".format(index_path, os.getpid())
+    with open(temporary_path, "wb") as index_file:
+        index_file.write(contents)
+    os.replace(temporary_path, index_path)
+
+
+def is_index_current(index_path, source_path):
+    """
+    Function checks whether the index file exists and was built from the current version of the word list
+
+    Returns:
+        bool: True if the index can be used as it is, False if it has to be rebuilt
+    """
+    try:
+        source_stat = os.stat(source_path)
+        with open(index_path, "rb") as index_file:
+            header = index_file.read(struct.calcsize(HEADER_FORMAT))
+    except OSError:
+        return False
+
+    if len(header) != struct.calcsize(HEADER_FORMAT):
+        return False
+
+    magic, size, mtime_ns, _ = struct.unpack(HEADER_FORMAT, header)
+    return magic == MAGIC and size == source_stat.st_size and mtime_ns == source_stat.st_mtime_ns
+
+
+class WordIndex:
+    """
+    Read-only collection of the words in a word list, backed by a compiled and memory-mapped index file.
+    Nothing is read until the collection is first used. The index is rebuilt only when the word list changes,
+    and the mapped pages are shared by every process using the same index file.
+
+    Supports membership tests, iteration in the order of the word list, and len().
+    Membership is tested by a binary search of the sorted bucket of the word's length in the mapped index,
+    with one word in every FENCE_STEP kept in memory, so no process keeps its own copy of the word list.
+    """
+
+    def __init__(self, source_path, index_path=None):
+        self.source_path = source_path
+        self.index_path = index_path if index_path is not None else os.path.splitext(source_path)[0] + ".idx"
+        self._data = None
+        self._buckets = None
+        self._length = 0
+
+    def _load(self):
+        """
+        Maps the index into memory, compiling it first if it is missing or out of date.
+        Falls back to keeping the index in memory if it can't be written next to the word list.
+        """
+        if self._buckets is not None:
+            return
+
+        data = None
+        if not is_index_current(self.index_path, self.source_path):
+            contents = compile_index(self.source_path)
+            try:
+                write_index(contents, self.index_path)
+            except OSError:
+                data = contents
+
+        if data is None:
+            with open(self.index_path, "rb") as index_file:
+                data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header_size = struct.calcsize(HEADER_FORMAT)
+        bucket_size = struct.calcsize(BUCKET_FORMAT)
+        bucket_total = struct.unpack(HEADER_FORMAT, data[:header_size])[3]
+
+        buckets = {}
+        length = 0
+        for i in range(bucket_total):
+            entry_start = header_size + i * bucket_size
+            width, offset, count = struct.unpack(BUCKET_FORMAT, data[entry_start:entry_start + bucket_size])
+            buckets[width] = _Bucket(data, offset, width, count)
+            length += count
+
+        self._data = data
+        self._length = length
+        self._buckets = buckets
+
+    def __contains__(self, word):
+        self._load()
+        encoded = word.encode("utf-8")
+        # buckets are by encoded width
+        bucket = self._buckets.get(len(encoded))
+        return bucket is not None and encoded in bucket
+
+    def count_known(self, words):
+        """
+        Function counts how many of the words are in the collection, the fast way to test many words at once
+
+        Args:
+            words: an iterable of strings
+
+        Returns:
+            int: number of the words found in the collection
+        """
+        self._load()
+        buckets = self._buckets
+        count = 0
+        for word in words:
+            encoded = word.encode("utf-8")
+            bucket = buckets.get(len(encoded))
+            if bucket is not None and encoded in bucket:
+                count += 1
+        return count
+
+    def __iter__(self):
+        self._load()
+        widths = sorted(self._buckets)
+        # number of the first word of every bucket
+        first_numbers = []
+        word_number = 0
+        for width in widths:
+            first_numbers.append(word_number)
+            word_number += self._buckets[width].count
+
+        order_start = len(self._data) - struct.calcsize(ORDER_FORMAT) * self._length
+        for (word_number,) in struct.iter_unpack(ORDER_FORMAT, self._data[order_start:]):
+            i = bisect_right(first_numbers, word_number) - 1
+            yield self._buckets[widths[i]][word_number - first_numbers[i]].decode("utf-8")
+
+    def __len__(self):
+        self._load()
+        return self._length
+
+    def keys(self):
+        """
+        Returns the collection itself, so it can be used wherever the words were kept as dictionary keys
+        """
+        return self
+
+    def lengths(self):
+        """
+        Returns:
+            list: the sorted lengths of the words in the collection
+        """
+        self._load()
+        return sorted(self._buckets)
+
+    def count_of_length(self, length):
+        """
+        Returns:
+            int: the number of words of one length in the collection
+        """
+        self._load()
+        bucket = self._buckets.get(length)
+        return 0 if bucket is None else bucket.count
+
+    def words_of_length(self, length):
+        """
+        Generator yielding the words of one length in alphabetical order
+
+        Args:
+            length: int, length of the words
+        """
+        self._load()
+        bucket = self._buckets.get(length)
+        if bucket is None:
+            return
+
+        words = bucket.data[bucket.offset:bucket.offset + bucket.width * bucket.count]
+        for start in range(0, len(words), bucket.width):
+            yield words[start:start + bucket.width].decode("utf-8")
+
@@ -0,0 +1,134 @@
+import re
+import string
+import cipherText
+import vigenere
+
+# Number of likely key lengths whose words are tried first
+KEY_LENGTHS_RANKED = 6
+
+# Number of the most likely key letters of each column, see vigenere.rank_key_letters, that a word's letter
+# at that position has to be among
+PLAUSIBLE_LETTERS = 9
+
+# Columns with fewer letters than this say too little about their key letter, so any letter is plausible there
+MIN_COLUMN_LETTERS = 8
+
+
+def order_word_lengths(cipher_text, word_lengths, how_many=KEY_LENGTHS_RANKED):
+    """
+    Function orders the lengths of dictionary words by how likely a key of that length is.
+    The key lengths ranked by vigenere.find_likely_key_lengths come first, then the divisors of those lengths,
+    because a ranked length is often a multiple of the real one, and then every other length, shortest first.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext of text to be deciphered
+        word_lengths: an iterable of ints, the lengths of the words in the dictionary
+        how_many: int, number of ranked key lengths, defaults to KEY_LENGTHS_RANKED
+
+    Returns:
+        list: every length of word_lengths, once
+    """
+    word_lengths = sorted(set(word_lengths))
+    ranked = vigenere.find_likely_key_lengths(cipher_text, how_many, use_coincidence=True)
+
+    ordered = [length for length in ranked if length in word_lengths]
+    for key_length in ranked:
+        for length in word_lengths:
+            if key_length % length == 0 and length not in ordered:
+                ordered.append(length)
+    ordered.extend(length for length in word_lengths if length not in ordered)
+
+    return ordered
+
+
+def build_feasibility_index(cipher_text, key_length, plausible_letters=PLAUSIBLE_LETTERS):
+    """
+    Function records which letters are plausible key letters at each position of a key of a given length:
+    the plausible_letters best scoring letters of the position's column, or any letter if the column is too short
+    to tell.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext of text to be deciphered
+        key_length: int, length of the key
+        plausible_letters: int, number of letters kept for each position, defaults to PLAUSIBLE_LETTERS
+
+    Returns:
+        list: a string of the plausible letters for every key position
+    """
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    index = []
+
+    for column, ranked_letters in zip(cipher_text.columns(key_length),
+                                      vigenere.rank_key_letters(cipher_text, key_length)):
+        if len(column) < MIN_COLUMN_LETTERS:
+            index.append(string.ascii_uppercase)
+        else:
+            index.append("".join(sorted(letter for letter, score in ranked_letters[:plausible_letters])))
+
+    return index
+
+
+def feasible_words(words, index):
+    """
+    Function keeps the words whose every letter is plausible at its position, see build_feasibility_index.
+    The index is compiled into a regular expression with a character class for each position,
+    so the words are checked without a Python loop over their letters.
+
+    Args:
+        words: an iterable of uppercase words, all as long as the index
+        index: list of strings returned by build_feasibility_index
+
+    Returns:
+        list: the feasible words, in their original order
+    """
+    pattern = re.compile("".join("[{}]".format(letters) for letters in index))
+    return [word for word in words if pattern.fullmatch(word)]
+
+
+def infeasible_words(words, index):
+    """
+    Function keeps the words that feasible_words leaves out
+
+    Args:
+        words: an iterable of uppercase words, all as long as the index
+        index: list of strings returned by build_feasibility_index
+
+    Returns:
+        list: the infeasible words, in their original order
+    """
+    pattern = re.compile("".join("[{}]".format(letters) for letters in index))
+    return [word for word in words if not pattern.fullmatch(word)]
+
+
+def candidate_words(cipher_text, dictionary, plausible_letters=PLAUSIBLE_LETTERS, counts=None, fallback=False):
+    """
+    Generator yielding the dictionary words worth trying as keys, bucketed by length and the most likely
+    key lengths first, see order_word_lengths. Only words consistent with the letter statistics of the columns
+    their length cuts the cipher text into are yielded, which leaves a small fraction of the dictionary.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext of text to be deciphered
+        dictionary: a dictionaryIndex.WordIndex, such as languageFunctions.ENGLISH_DICTIONARY
+        plausible_letters: int, number of letters plausible at each key position, defaults to PLAUSIBLE_LETTERS
+        counts: optional dict, filled with the number of words considered and yielded for every length
+        fallback: bool, if True the words left out are yielded after all the others, in the same order of lengths.
+            The columns of a short text can rule out the real key letters, which loses the key of about one text of
+            100 to 200 letters in ten. Defaults to False
+
+    Yields:
+        string: the next word to try
+    """
+    # normalized once, so the columns of every length are cut from the same letters
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    lengths = order_word_lengths(cipher_text, dictionary.lengths())
+    for length in lengths:
+        words = list(dictionary.words_of_length(length))
+        kept = feasible_words(words, build_feasibility_index(cipher_text, length, plausible_letters))
+        if counts is not None:
+            counts[length] = (len(words), len(kept))
+        yield from kept
+
+    if fallback:
+        for length in lengths:
+            yield from infeasible_words(dictionary.words_of_length(length),
+                                        build_feasibility_index(cipher_text, length, plausible_letters))
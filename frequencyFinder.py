@@ -1,4 +1,72 @@
 import string
+from collections import Counter
+
+# Six most and least common characters in the English language, and all characters in order of frequency
+MOST_COMMON = "ETAOIN"
+LEAST_COMMON = "VKJXQZ"
+FREQUENCY_ORDER = "ETAOINSHRDLCUMWFGYPBVKJXQZ"
+
+_LETTER_INDEXES = {letter: i for i, letter in enumerate(string.ascii_uppercase)}
+_FREQUENCY_RANKS = [FREQUENCY_ORDER.index(letter) for letter in string.ascii_uppercase]
+_MOST_COMMON_INDEXES = frozenset(_LETTER_INDEXES[letter] for letter in MOST_COMMON)
+_LEAST_COMMON_INDEXES = frozenset(_LETTER_INDEXES[letter] for letter in LEAST_COMMON)
+
+# Relative frequency of each letter in English text, A first
+ENGLISH_LETTER_FREQUENCIES = (
+    0.08167, 0.01492, 0.02782, 0.04253, 0.12702, 0.02228, 0.02015, 0.06094, 0.06966, 0.00153, 0.00772, 0.04025,
+    0.02406, 0.06749, 0.07507, 0.01929, 0.00095, 0.05987, 0.06327, 0.09056, 0.02758, 0.00978, 0.02360, 0.00150,
+    0.01974, 0.00074,
+)
+
+
+def text_histogram(text):
+    """
+    Function counts the letters of a string, ignoring case and every character that isn't a letter
+
+    Args:
+        text: string of text to analyse
+
+    Returns:
+        list: 26 ints, the count of A first
+    """
+    histogram = [0] * 26
+
+    # every distinct character is upper-cased and looked up only once
+    for character, count in Counter(text).items():
+        letter_index = _LETTER_INDEXES.get(character.upper())
+        if letter_index is not None:
+            histogram[letter_index] += count
+
+    return histogram
+
+
+def histogram_frequency_score(histogram):
+    """
+    Function scores the similarity of a letter histogram to English, see english_frequency_score
+
+    Args:
+        histogram: a list of 26 letter counts, A first
+
+    Returns:
+        int: score ranging between 0 and 12, the higher the closer the character
+            distribution to English
+    """
+    # all letters ordered by how frequently they appear in the text,
+    # in case of ties ordered by reverse ETAOIN order
+    letter_order = sorted(range(26), key=lambda i: (-histogram[i], -_FREQUENCY_RANKS[i]))
+
+    # check the overlap between six most common characters in the text and in English,
+    # and between the six least common characters in the text and in English
+    # award points based on overlap
+    freq_score = 0
+    for letter_index in letter_order[:6]:
+        if letter_index in _MOST_COMMON_INDEXES:
+            freq_score += 1
+    for letter_index in letter_order[-6:]:
+        if letter_index in _LEAST_COMMON_INDEXES:
+            freq_score += 1
+
+    return freq_score
 
 
 def english_frequency_score(text):
@@ -14,65 +82,46 @@ def english_frequency_score(text):
         int: score ranging between 0 and 12, the higher the closer the character
             distribution in the string to English
     """
+    return histogram_frequency_score(text_histogram(text))
 
-    freq_score = 0
-    # Six most and least common characters in the English language
-    most_common = "ETAOIN"
-    least_common = "VKJXQZ"
-    freq_order = "ETAOINSHRDLCUMWFGYPBVKJXQZ"
 
-    uppercase = string.ascii_uppercase
+def shift_frequency_scores(histogram):
+    """
+    Function takes the letter histogram of a Caesar cipher and returns the english_frequency_score of deciphering it
+    with every letter of the alphabet. Each shift is a rotation of the histogram, so nothing is deciphered.
+
+    Args:
+        histogram: a list of 26 letter counts, A first
+
+    Returns:
+        list: 26 ints between 0 and 12, the score of deciphering with A first
+    """
+    return [histogram_frequency_score(histogram[shift:] + histogram[:shift]) for shift in range(26)]
 
-    # Prepare a dictionary to store character counts
-    letter_count_dict = {}
-    for letter in uppercase:
-        letter_count_dict[letter] = 0
 
-    # Count the characters in text and update the dictionary
-    for letter in text:
-        if letter.upper() in uppercase:
-            letter_count_dict[letter.upper()] += 1
+def chi_squared_shift_scores(histogram):
+    """
+    Function takes the letter histogram of a Caesar cipher and scores every possible shift at once.
+    Deciphering with key letter k turns the count of letter j + k into the count of letter j,
+    so each shift is a rotation of the same histogram and nothing needs to be deciphered.
+    The score is the chi-squared statistic of the rotated histogram against English letter frequencies.
 
-    # list_of_freqs is a list of tuples consisting of letter and its count pairs
-    # list is used here to enable sorting of the data
-    list_of_freqs = []
-    for key in letter_count_dict:
-        list_of_freqs.append((key, letter_count_dict[key]))
+    Args:
+        histogram: a list of 26 letter counts, A first
 
-    # sorting the list of tuples by letter count
-    list_of_freqs.sort(key=lambda t: t[1], reverse=True)
+    Returns:
+        list: 26 floats, the score of deciphering with A first. The lower the score, the closer to English
+    """
+    total = sum(histogram)
+    if total == 0:
+        return [0.0] * 26
 
-    # creates a letter_frequency_string in which all characters are ordered by how frequently they appear in text
-    # in case of ties ordered by reverse ETAOIN order
-    letter_frequency_string = []
-    current_freq = -1
-    current_string = []
-    for tup in list_of_freqs:
-        if tup[1] == current_freq:
-            current_string.append(tup[0])
-        else:
-            current_freq = tup[1]
-            if len(current_string) > 0:
-                s = "".join(sorted(current_string, key=lambda w: [freq_order.index(c) for c in w], reverse=True))
-                letter_frequency_string.append(s)
-                current_string.clear()
-            current_string.append(tup[0])
-
-    s = "".join(sorted(current_string, key=lambda w: [freq_order.index(c) for c in w], reverse=True))
-    letter_frequency_string.append(s)
-    letter_frequency_string = "".join(letter_frequency_string)
-
-    # check the overlap between six most common characters in the text and in English
-    # award points based on overlap
-    for letter in letter_frequency_string[:6]:
-        if letter in most_common:
-            freq_score += 1
+    expected_counts = [frequency * total for frequency in ENGLISH_LETTER_FREQUENCIES]
+    scores = []
 
-    # check the overlap between six least common characters in the text and in English
-    # award points based on overlap
-    for letter in letter_frequency_string[-6:]:
-        if letter in least_common:
-            freq_score += 1
+    for shift in range(26):
+        rotated = histogram[shift:] + histogram[:shift]
+        scores.append(sum((observed - expected) ** 2 / expected
+                          for observed, expected in zip(rotated, expected_counts)))
 
-    # return the English frequency score
-    return freq_score
+    return scores
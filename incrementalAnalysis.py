@@ -0,0 +1,212 @@
+import cipherText
+import coincidence
+import kasiski
+import metrics
+import vigenere
+
+# Number of letters at the start of the stream that keys are ranked on, see StreamAnalyzer.rank_keys.
+# The start lines up with the first letter of every key, whatever its length, and stays the same as the stream grows
+SCORED_LETTERS = 2000
+
+
+class StreamAnalyzer:
+    """
+    Key length and key letter analysis of a cipher text that keeps growing, such as a live capture.
+    Everything the analysis needs is kept up to date as letters are appended, in time proportional to the new
+    letters only: the last position of every repeated sequence, the number of Kasiski spacings every key length
+    divides, and the letter histograms of the columns of every key length.
+    Key lengths and keys are ranked again from those on demand, so a new best guess after every chunk doesn't
+    reprocess the letters that came before it.
+
+    The rankings are the same as those of vigenere.find_likely_key_lengths with use_coincidence and
+    vigenere.find_possible_keys on the whole text.
+    """
+
+    def __init__(self, sequence_lengths=kasiski.DEFAULT_SEQUENCE_LENGTHS,
+                 max_key_length=kasiski.DEFAULT_MAX_KEY_LENGTH):
+        """
+        Args:
+            sequence_lengths: an iterable of ints, the lengths of the repeated sequences to look for,
+                defaults to 3, 4 and 5
+            max_key_length: int, the longest key length kept track of, defaults to 40
+        """
+        self.sequence_lengths = sorted(length for length in set(sequence_lengths) if length > 0)
+        self.max_key_length = max_key_length
+        self.letters = bytearray()
+        # last_positions[n] maps the base 26 number of every sequence of length n, see kasiski.find_repeat_spacings,
+        # to the position it last appeared at
+        self.last_positions = {length: {} for length in self.sequence_lengths}
+        # factor_counts[L] is the number of spacings between repeated sequences that key length L divides
+        self.factor_counts = [0] * (max_key_length + 1)
+        # Only the histograms of the longest key lengths are counted, every shorter length has a multiple among them
+        # and its histograms are folded from it when asked for
+        self._counted_lengths = range(max_key_length // 2 + 1, max_key_length + 1)
+        self._histograms = {key_length: [[0] * 26 for _ in range(key_length)] for key_length in self._counted_lengths}
+        self._folded = {}
+
+    def __len__(self):
+        return len(self.letters)
+
+    def append(self, text):
+        """
+        Function adds the next chunk of the stream and updates the analysis with it
+
+        Args:
+            text: string of cipher text, everything but its letters is ignored
+
+        Returns:
+            int: number of letters added
+        """
+        new_letters = cipherText.Ciphertext(text).letters
+        start = len(self.letters)
+        self.letters += new_letters
+        self._folded = {}
+
+        with metrics.timed("incremental_analysis"):
+            self._update_repeats(start)
+            self._update_histograms(new_letters, start)
+
+        return len(new_letters)
+
+    def _update_repeats(self, start):
+        """
+        Function looks up every sequence that ends among the letters appended from start, counting the spacing
+        to its last appearance, and records it as the new last appearance
+        """
+        if not self.sequence_lengths:
+            return
+        # the sequences crossing into the new letters start up to the longest sequence length before them
+        offset = max(0, start - self.sequence_lengths[-1] + 1)
+        letter_values = [letter - 65 for letter in self.letters[offset:]]
+        sequence_numbers = letter_values
+        current_length = 1
+
+        for seq_length in self.sequence_lengths:
+            while current_length < seq_length:
+                sequence_numbers = [number * 26 + letter
+                                    for number, letter in zip(sequence_numbers, letter_values[current_length:])]
+                current_length += 1
+
+            last_positions = self.last_positions[seq_length]
+            first_new = max(0, start - seq_length + 1) - offset
+            for index in range(first_new, len(sequence_numbers)):
+                number = sequence_numbers[index]
+                position = offset + index
+                previous = last_positions.get(number)
+                if previous is not None:
+                    spacing = position - previous
+                    for key_length in range(2, min(spacing, self.max_key_length) + 1):
+                        if spacing % key_length == 0:
+                            self.factor_counts[key_length] += 1
+                last_positions[number] = position
+
+    def _update_histograms(self, new_letters, start):
+        """
+        Function counts the appended letters into the columns of every counted key length.
+        The letter at position start + i falls in column (start + i) % key_length.
+        """
+        for key_length, histograms in self._histograms.items():
+            for position in range(key_length):
+                column = new_letters[(position - start) % key_length::key_length]
+                if column:
+                    histogram = histograms[position]
+                    for letter in range(26):
+                        histogram[letter] += column.count(letter + 65)
+
+    def column_histograms(self, key_length):
+        """
+        Function returns the letter histograms of the columns of a key length, see
+        cipherText.Ciphertext.column_histograms. Lengths longer than max_key_length are counted from every letter.
+
+        Returns:
+            list: a tuple of 26 letter counts for every column, A first. They are copies, changing them doesn't
+                change the analysis
+        """
+        return [tuple(histogram) for histogram in self._column_histograms(key_length)]
+
+    def _column_histograms(self, key_length):
+        """
+        Function returns the histograms of column_histograms without copying them, for the analysis itself
+        """
+        if key_length in self._histograms:
+            return self._histograms[key_length]
+        if key_length > self.max_key_length:
+            return cipherText.Ciphertext.from_prepared(self.letters).column_histograms(key_length)
+        if key_length not in self._folded:
+            multiple = next(length for length in self._counted_lengths if length % key_length == 0)
+            self._folded[key_length] = cipherText.fold_histograms(self._histograms[multiple], key_length)
+        return self._folded[key_length]
+
+    def rank_key_lengths(self, how_many=6):
+        """
+        Function ranks key lengths by the Kasiski spacings and the index of coincidence of the letters so far,
+        see vigenere.find_likely_key_lengths
+
+        Args:
+            how_many: int, number of key lengths returned, defaults to 6
+
+        Returns:
+            list: a list of integers denoting likely key lengths
+        """
+        with metrics.timed("key_length_search"):
+            kasiski_scores = {key_length: self.factor_counts[key_length]
+                              for key_length in range(2, min(self.max_key_length, len(self)) + 1)
+                              if self.factor_counts[key_length] > 0}
+            kasiski_ranking = sorted(kasiski_scores.items(), key=lambda t: (-t[1], t[0]))
+
+            coincidence_scores = coincidence.score_key_lengths(
+                self._column_histograms, coincidence.longest_scored_key_length(len(self), self.max_key_length))
+            ranking = coincidence.merge_with_kasiski(kasiski_ranking, coincidence_scores, how_many)
+
+        return [key_length for key_length, score in ranking]
+
+    def rank_key_letters(self, key_length):
+        """
+        Function ranks the letters of every key position by the histograms of their columns so far,
+        see vigenere.rank_key_letters
+
+        Returns:
+            list: a list of (letter, score) tuples for every key position, the most likely letter first
+        """
+        return vigenere.rank_histogram_letters(self._column_histograms(key_length))
+
+    def find_keys(self, how_many=6, max_keys=vigenere.DEFAULT_MAX_KEYS):
+        """
+        Generator producing the most likely keys of the most likely key lengths so far, reduced to their
+        vigenere.minimal_period and each of them once, see vigenere.find_keys_for_lengths
+
+        Args:
+            how_many: int, number of likely key lengths tried, defaults to 6
+            max_keys: int, the most keys produced for each key length, defaults to vigenere.DEFAULT_MAX_KEYS
+
+        Yields:
+            string: the next key
+        """
+        yield from vigenere.find_keys_for_lengths(self, self.rank_key_lengths(how_many), max_keys)
+
+    def rank_keys(self, how_many=vigenere.DEFAULT_RANKED_CANDIDATES, key_lengths_tried=6,
+                  max_keys=vigenere.DEFAULT_MAX_KEYS):
+        """
+        Function ranks the keys of find_keys by the n-gram fitness of the first SCORED_LETTERS letters they decipher,
+        the current best guess of the key
+
+        Args:
+            how_many: int, number of candidates returned, defaults to vigenere.DEFAULT_RANKED_CANDIDATES
+            key_lengths_tried: int, number of likely key lengths tried, defaults to 6
+            max_keys: int, the most keys tried for each key length, defaults to vigenere.DEFAULT_MAX_KEYS
+
+        Returns:
+            list: a list of (key, plaintext, score) tuples, the plaintext being the first SCORED_LETTERS letters
+                deciphered, the highest n-gram fitness first
+        """
+        scored_text = cipherText.Ciphertext.from_prepared(self.letters[:SCORED_LETTERS])
+        return vigenere.rank_keys_by_fitness(scored_text, self.find_keys(key_lengths_tried, max_keys), how_many)
+
+    def decipher(self, key):
+        """
+        Function deciphers every letter of the stream so far with a key
+
+        Returns:
+            string: the plaintext, without spaces
+        """
+        return vigenere.decipher_letters(bytes(self.letters), key).decode("ascii")
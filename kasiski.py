@@ -0,0 +1,154 @@
+import cipherText
+
+# Lengths of the repeated sequences looked for by default
+DEFAULT_SEQUENCE_LENGTHS = range(3, 6)
+
+# Longest key length that is scored by default
+DEFAULT_MAX_KEY_LENGTH = 40
+
+
+def encode_letters(text):
+    """
+    Function turns a string into a list of letter values between 0 and 25, ignoring everything but letters
+
+    Args:
+        text: string or cipherText.Ciphertext of text to be encoded
+
+    Returns:
+        list: a list of ints, one for every letter in the text
+    """
+    return cipherText.as_ciphertext(text).letter_values()
+
+
+def find_repeat_spacings(letter_values, sequence_lengths=DEFAULT_SEQUENCE_LENGTHS, message_lengths=None):
+    """
+    Function finds every sequence of letters that appears more than once, and counts the spacings between
+    consecutive appearances of each one.
+    Every sequence of length n is turned into a number in base 26, built from the numbers of the sequences of
+    length n - 1 in a single pass, so sequences of any length are compared as ints instead of strings.
+    Appearances of the same sequence are then found next to each other by sorting the positions by those numbers.
+
+    The letters can also be several messages enciphered with the same key, joined one after the other, each starting
+    at the first letter of the key. Sequences then don't cross from one message into the next, and spacings are
+    measured between the positions of the appearances in their own messages, which is their distance in the key.
+
+    Args:
+        letter_values: a list of ints between 0 and 25, as returned by encode_letters
+        sequence_lengths: an iterable of ints, the lengths of the sequences to look for, defaults to 3, 4 and 5
+        message_lengths: optional list of ints, the number of letters of each joined message
+
+    Returns:
+        list: a list where the item at index s is how many times two appearances of a sequence were s letters apart
+    """
+    text_length = len(letter_values)
+    sequence_lengths = sorted(set(sequence_lengths))
+
+    # message_ends[i] is the end of the message of letter i, and phases[i] its position in that message
+    message_ends = None
+    phases = None
+    if message_lengths is not None and len(message_lengths) > 1:
+        message_ends = []
+        phases = []
+        end = 0
+        for length in message_lengths:
+            end += length
+            message_ends.extend([end] * length)
+            phases.extend(range(length))
+        text_length = max(message_lengths)
+    spacing_counts = [0] * (text_length + 1)
+
+    # sequence_numbers[i] is the number of the sequence of the current length starting at position i
+    sequence_numbers = list(letter_values)
+    current_length = 1
+
+    for seq_length in sequence_lengths:
+        if seq_length < 1 or seq_length > text_length:
+            continue
+
+        while current_length < seq_length:
+            sequence_numbers = [number * 26 + letter
+                                for number, letter in zip(sequence_numbers, letter_values[current_length:])]
+            current_length += 1
+
+        # Sorting positions by sequence number puts the appearances of each sequence next to each other,
+        # in order of position
+        if message_ends is None:
+            positions = sorted(range(len(sequence_numbers)), key=sequence_numbers.__getitem__)
+            for previous, position in zip(positions, positions[1:]):
+                if sequence_numbers[previous] == sequence_numbers[position]:
+                    spacing_counts[position - previous] += 1
+        else:
+            positions = sorted((i for i in range(len(sequence_numbers)) if i + seq_length <= message_ends[i]),
+                               key=sequence_numbers.__getitem__)
+            for previous, position in zip(positions, positions[1:]):
+                if sequence_numbers[previous] == sequence_numbers[position]:
+                    # appearances at the same position of two messages say nothing about the key length
+                    spacing = abs(phases[position] - phases[previous])
+                    if spacing > 0:
+                        spacing_counts[spacing] += 1
+
+    return spacing_counts
+
+
+def score_key_lengths(spacing_counts, max_key_length=DEFAULT_MAX_KEY_LENGTH):
+    """
+    Function scores every key length from 2 up to max_key_length by the number of spacings it divides.
+    Instead of factoring every spacing, the counts of all multiples of a key length are summed with one slice.
+
+    Args:
+        spacing_counts: a list of spacing counts, as returned by find_repeat_spacings
+        max_key_length: int, the longest key length to be scored
+
+    Returns:
+        dict: key lengths as keys, and the number of spacings they divide as values
+    """
+    scores = {}
+
+    for key_length in range(2, min(max_key_length, len(spacing_counts) - 1) + 1):
+        score = sum(spacing_counts[key_length::key_length])
+        if score > 0:
+            scores[key_length] = score
+
+    return scores
+
+
+def rank_key_lengths(cipher_text, how_many=None, sequence_lengths=DEFAULT_SEQUENCE_LENGTHS,
+                     max_key_length=DEFAULT_MAX_KEY_LENGTH):
+    """
+    Function performs Kasiski examination of the cipher text and ranks the likely key lengths
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext of text to be analysed
+        how_many: optional int, how many key lengths to return, by default all lengths with a score
+        sequence_lengths: an iterable of ints, the lengths of repeated sequences to look for
+        max_key_length: int, the longest key length to be considered
+
+    Returns:
+        list: a list of (key length, score) tuples, the most likely key length first.
+            The score is the number of spacings between repeated sequences that the key length divides
+    """
+    spacing_counts = find_repeat_spacings(encode_letters(cipher_text), sequence_lengths)
+    return rank_spacings(spacing_counts, how_many, max_key_length)
+
+
+def rank_spacings(spacing_counts, how_many=None, max_key_length=DEFAULT_MAX_KEY_LENGTH):
+    """
+    Function ranks key lengths by the number of spacings between repeated sequences they divide, see rank_key_lengths
+
+    Args:
+        spacing_counts: a list of spacing counts, as returned by find_repeat_spacings
+        how_many: optional int, how many key lengths to return, by default all lengths with a score
+        max_key_length: int, the longest key length to be considered
+
+    Returns:
+        list: a list of (key length, score) tuples, the most likely key length first
+    """
+    scores = score_key_lengths(spacing_counts, max_key_length)
+
+    # sort by score in descending order, shorter key lengths first in case of ties
+    ranking = sorted(scores.items(), key=lambda t: (-t[1], t[0]))
+
+    if how_many is not None:
+        ranking = ranking[:how_many]
+
+    return ranking
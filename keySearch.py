@@ -0,0 +1,292 @@
+import functools
+import math
+import random
+import string
+import time
+import cipherText
+import ngramFitness
+import vigenere
+
+# Number of likely key lengths searched by default
+KEY_LENGTHS_TRIED = 3
+
+# Number of times the search starts over from a new key for every key length.
+# The first start is the key of the most likely letters, see vigenere.rank_key_letters, the others are random
+DEFAULT_RESTARTS = 10
+
+# Number of single letter changes tried by simulated annealing, per key position
+ANNEALING_STEPS_PER_POSITION = 100
+
+# Temperature at the start of annealing, in log10 probability per n-gram of the changed column.
+# It falls geometrically to FINAL_TEMPERATURE, after which only improvements are accepted
+INITIAL_TEMPERATURE = 0.4
+FINAL_TEMPERATURE = 0.01
+
+# The search stops before using every restart once this many starts have ended on the best key found so far.
+# Short columns let wrong keys fit the n-grams of a text almost as well as the right one, so a single good
+# score isn't proof, but different starts ending on the same key are
+CONFIRMATIONS = 2
+
+# A key length is given up once GIVE_UP_STARTS starts leave its best score GIVE_UP_MARGIN below the best score of
+# a key length searched before it, in log10 probability per n-gram. The best keys of wrong key lengths score far below
+# English, and more starts hardly improve them. The right length can need a few starts to get out of a poor first
+# key, but then scores like the best length or better
+GIVE_UP_MARGIN = 0.3
+GIVE_UP_STARTS = 4
+
+# A progress function is called every this many key changes during a start, so it can stop a long search
+PROGRESS_STEPS = 500
+
+
+class _ColumnSearch:
+    """
+    Letters of the cipher text deciphered with a key that changes one position at a time.
+    Changing the key letter of one position only changes the letters of its column, and only the n-grams
+    touching those letters, so each change is scored by looking those n-grams up again instead of
+    deciphering and scoring the whole text.
+    """
+    __slots__ = ("key_length", "n", "table", "plain", "column_plaintexts", "runs")
+
+    def __init__(self, letters, key_length, table, n):
+        self.key_length = key_length
+        self.n = n
+        self.table = table
+        # plaintext as letter values between 0 and 25
+        self.plain = bytearray(letters.translate(ngramFitness.LETTER_VALUES))
+
+        # the plaintext values of every column deciphered with each of the 26 key letters, worked out once
+        self.column_plaintexts = []
+        for position in range(key_length):
+            column = letters[position::key_length]
+            self.column_plaintexts.append([column.translate(vigenere.DECIPHER_TABLES[letter])
+                                           .translate(ngramFitness.LETTER_VALUES)
+                                           for letter in string.ascii_uppercase])
+
+        # for every position, the stretches of text holding all n-grams that touch its column, without overlaps
+        text_length = len(letters)
+        self.runs = []
+        for position in range(key_length):
+            runs = []
+            for i in range(position, text_length, key_length):
+                first_start = max(i - n + 1, 0)
+                last_start = min(i, text_length - n)
+                if last_start < first_start:
+                    continue
+                if runs and first_start <= runs[-1][1] + 1:
+                    runs[-1][1] = last_start
+                else:
+                    runs.append([first_start, last_start])
+            self.runs.append([(first_start, last_start + n) for first_start, last_start in runs])
+
+    def set_letter(self, position, letter_index):
+        self.plain[position::self.key_length] = self.column_plaintexts[position][letter_index]
+
+    def column_score(self, position):
+        """
+        Returns:
+            float: the sum of the log10 probabilities of every n-gram touching the column of the position
+        """
+        table = self.table
+        score = 0.0
+        for start, end in self.runs[position]:
+            score += sum(map(table.__getitem__, ngramFitness.encode_ngrams(self.plain[start:end], self.n)))
+        return score
+
+    def total_score(self):
+        return sum(map(self.table.__getitem__, ngramFitness.encode_ngrams(self.plain, self.n)))
+
+    def ngram_count(self, position):
+        return sum(end - start - self.n + 1 for start, end in self.runs[position])
+
+
+def _anneal(search, key, rng, check=None):
+    """
+    Function improves a key by simulated annealing, changing one random position to a random letter at a time.
+    Changes that make the plaintext more English are always kept, worse ones are kept with a probability that
+    falls with the temperature, so the search can leave keys that only look best locally.
+
+    Args:
+        search: _ColumnSearch deciphered with key
+        key: list of letter indexes, changed in place
+        rng: random.Random used for every choice
+        check: optional function called every PROGRESS_STEPS changes, which may raise to stop the search
+    """
+    key_length = len(key)
+    steps = ANNEALING_STEPS_PER_POSITION * key_length
+    cooling = (FINAL_TEMPERATURE / INITIAL_TEMPERATURE) ** (1 / steps)
+    temperature = INITIAL_TEMPERATURE
+    ngram_counts = [max(search.ngram_count(position), 1) for position in range(key_length)]
+
+    for step in range(steps):
+        if check is not None and step % PROGRESS_STEPS == 0:
+            check()
+        position = rng.randrange(key_length)
+        letter_index = rng.randrange(26)
+        old_letter_index = key[position]
+        if letter_index == old_letter_index:
+            continue
+
+        old_score = search.column_score(position)
+        search.set_letter(position, letter_index)
+        delta = search.column_score(position) - old_score
+
+        # the temperature is per n-gram, so columns of any length cool down alike
+        if delta >= 0 or rng.random() < math.exp(delta / (temperature * ngram_counts[position])):
+            key[position] = letter_index
+        else:
+            search.set_letter(position, old_letter_index)
+        temperature *= cooling
+
+
+def _climb(search, key, check=None):
+    """
+    Function improves a key by hill climbing: every position in turn is set to its best letter,
+    until a whole pass over the key changes nothing
+
+    Args:
+        search: _ColumnSearch deciphered with key
+        key: list of letter indexes, changed in place
+        check: optional function called before every pass, which may raise to stop the search
+    """
+    improved = True
+    while improved:
+        if check is not None:
+            check()
+        improved = False
+        for position in range(len(key)):
+            best_letter_index = key[position]
+            best_score = search.column_score(position)
+            for letter_index in range(26):
+                if letter_index == key[position]:
+                    continue
+                search.set_letter(position, letter_index)
+                score = search.column_score(position)
+                if score > best_score:
+                    best_letter_index, best_score = letter_index, score
+
+            search.set_letter(position, best_letter_index)
+            if best_letter_index != key[position]:
+                key[position] = best_letter_index
+                improved = True
+
+
+def search_key(cipher_text, key_length, restarts=DEFAULT_RESTARTS, seed=None, n=ngramFitness.DEFAULT_N,
+               deadline=None, give_up_below=None, progress=None):
+    """
+    Function looks for the key of a given length whose plaintext has the best n-gram fitness, by simulated
+    annealing followed by hill climbing, starting over restarts times.
+    Unlike find_possible_keys it doesn't rely on each column's letter frequencies alone, so it still works
+    when the key is long and every column has only a few letters.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext of text to be deciphered
+        key_length: int, length of the key
+        restarts: int, number of starting keys, defaults to DEFAULT_RESTARTS
+        seed: optional seed for the random choices, so a search can be repeated
+        n: int, length of the n-grams scored, defaults to ngramFitness.DEFAULT_N
+        deadline: optional time.monotonic() value after which no new start is made. The first start always runs
+        give_up_below: optional score, after GIVE_UP_STARTS starts no new start is made while the best score is
+            below it, such as one clearly worse than the best key of another key length
+        progress: optional function called with the number of starts finished so far, after every start and every
+            PROGRESS_STEPS key changes during one. It can stop the search by raising an exception
+
+    Returns:
+        tuple: the best key found and its score, the average log10 probability of an n-gram of the plaintext
+    """
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    letters = cipher_text.letters
+    ngram_total = len(letters) - n + 1
+    if key_length < 1 or ngram_total < 1:
+        return None, None
+
+    rng = random.Random(seed)
+    search = _ColumnSearch(letters, key_length, ngramFitness.get_table(n), n)
+    ranked_letters = vigenere.rank_key_letters(cipher_text, key_length)
+    best_key = None
+    best_score = None
+    confirmations = 0
+    check = None
+
+    for restart in range(restarts):
+        if progress is not None:
+            check = functools.partial(progress, restart)
+        if restart > 0 and deadline is not None and time.monotonic() >= deadline:
+            break
+        if restart == 0:
+            key = [string.ascii_uppercase.index(position[0][0]) for position in ranked_letters]
+        else:
+            key = [rng.randrange(26) for _ in range(key_length)]
+        for position, letter_index in enumerate(key):
+            search.set_letter(position, letter_index)
+
+        _anneal(search, key, rng, check)
+        _climb(search, key, check)
+        if progress is not None:
+            progress(restart + 1)
+
+        score = search.total_score() / ngram_total
+        key = "".join(string.ascii_uppercase[letter_index] for letter_index in key)
+        if key == best_key:
+            confirmations += 1
+            if confirmations >= CONFIRMATIONS:
+                break
+        elif best_score is None or score > best_score:
+            best_key = key
+            best_score = score
+            confirmations = 1
+
+        if give_up_below is not None and restart + 1 >= GIVE_UP_STARTS and best_score < give_up_below:
+            break
+
+    return best_key, best_score
+
+
+def find_key_candidates(cipher_text, how_many=KEY_LENGTHS_TRIED, restarts=DEFAULT_RESTARTS, seed=None,
+                        deadline=None, progress=None):
+    """
+    Generator that searches for the best key of each of the most likely key lengths,
+    see vigenere.find_likely_key_lengths and search_key.
+    A key length is given up after GIVE_UP_STARTS starts if its best key scores GIVE_UP_MARGIN below the best key
+    of a length searched before it.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext of text to be deciphered
+        how_many: int, number of likely key lengths searched, defaults to KEY_LENGTHS_TRIED
+        restarts: int, number of starting keys for every key length, defaults to DEFAULT_RESTARTS
+        seed: optional seed for the random choices
+        deadline: optional time.monotonic() value after which no more key lengths or starts are searched
+        progress: optional function called with the number of starts finished so far over all key lengths,
+            see search_key
+
+    Yields:
+        tuple: the key and the plaintext of the best key of each length, in order of likely key length.
+            A key repeating a shorter key is reduced to it, and each key is yielded once
+    """
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    keys_seen = set()
+    best_score = None
+    # starts finished by the key lengths searched before, and by the one being searched
+    starts_before = 0
+    length_starts = 0
+
+    def length_progress(starts):
+        nonlocal length_starts
+        length_starts = starts
+        progress(starts_before + starts)
+
+    for key_length in vigenere.find_likely_key_lengths(cipher_text, how_many, use_coincidence=True):
+        if deadline is not None and time.monotonic() >= deadline:
+            return
+        give_up_below = best_score - GIVE_UP_MARGIN if best_score is not None else None
+        key, score = search_key(cipher_text, key_length, restarts, seed, deadline=deadline,
+                                give_up_below=give_up_below, progress=length_progress if progress else None)
+        starts_before += length_starts
+        length_starts = 0
+        if key is None:
+            continue
+        if best_score is None or score > best_score:
+            best_score = score
+        key = vigenere.minimal_period(key)
+        if key not in keys_seen:
+            keys_seen.add(key)
+            yield key, vigenere.decipher_vigenere(cipher_text, key)
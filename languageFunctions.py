@@ -1,4 +1,10 @@
+import os
 import string
+import dictionaryIndex
+import metrics
+
+# The word list is looked up next to this file, so the program can be started from any directory
+DICTIONARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dictionary.txt")
 
 
 def check_for_spaces(text):
@@ -20,22 +26,14 @@ def check_for_spaces(text):
 
 def load_words():
     """
-    Function opens the dictionary.txt file,
-    stores its contents in a dictionary
-    and returns it.
-    Uses a dictionary for speed of access.
+    Function returns the words in the dictionary.txt file.
+    Nothing is read at this point: the words are loaded on first use from a compiled, memory-mapped index
+    of dictionary.txt, which is rebuilt whenever dictionary.txt changes.
 
     Returns:
-        dict: dictionary containing all words in dictionary.txt
+        dictionaryIndex.WordIndex: read-only collection of all words in dictionary.txt
     """
-    dict_file = open("dictionary.txt")
-    dictionary = {}
-
-    for word in dict_file.read().split():
-        dictionary[word] = None
-    dict_file.close()
-
-    return dictionary
+    return dictionaryIndex.WordIndex(DICTIONARY_PATH)
 
 
 ENGLISH_DICTIONARY = load_words()
@@ -79,41 +77,167 @@ def is_english(text, spaces=True):
 
     Returns:
          bool: in case of spaced text True if >= 33% of words the string are in English, False otherwise
-               in case of unspaced text the threshold is 70%
+               in case of unspaced text True if >= 70% of the letters are covered by English words of at least
+               MIN_COVERAGE_WORD_LENGTH letters
     """
+    if metrics.ENABLED:
+        metrics.increment("is_english_calls")
+    english_percent = english_score(text, spaces) * 100
 
-    # Spaces the text
-    if not spaces:
-        text = find_words_in_nospace(text)
+    if spaces:
+        return english_percent >= 33
+    # Threshold is higher for nonspaced strings because of single letter false positives
+    else:
+        return english_percent >= 70
 
-    english_count = 0
+
+def english_score(text, spaces=True):
+    """
+    Function takes a string and scores how English it is, see is_english
+
+    Args:
+        text: string of text
+        spaces: indicates whether the string has spaces or not, defaults to True
+
+    Returns:
+        float: between 0 and 1, in case of spaced text the fraction of words that are English,
+            in case of unspaced text the fraction of letters covered by English words, see word_coverage
+    """
+
+    # Unspaced text is scored by how much of it the best segmentation into dictionary words covers
+    if not spaces:
+        return word_coverage(text)
 
     # Turns the string uppercase, removes non-letters, and splits it into a list
     words_list = format_for_analysis(text).split()
 
     # Counts the English words
-    for word in words_list:
-        if word in ENGLISH_DICTIONARY:
-            english_count += 1
+    english_count = ENGLISH_DICTIONARY.count_known(words_list)
 
-    # Calculates the percentage of English words in the string
+    # Calculates the fraction of English words in the string
     if len(words_list) > 0:
-        english_percent = english_count / len(words_list) * 100
+        return english_count / len(words_list)
     else:
-        english_percent = 0
+        return 0
 
-    if english_percent >= 33 and spaces:
-        return True
-    # Threshold is higher for nonspaced strings because of single letter false positives
-    elif english_percent >= 70 and not spaces:
-        return True
-    else:
-        return False
+
+# Words shorter than this are left out of the coverage of unspaced text. The dictionary holds most one and two letter
+# strings, so in text deciphered with a wrong key they fill the gaps between the longer words found by chance
+MIN_COVERAGE_WORD_LENGTH = 3
+
+# Key marking the trie nodes at which a dictionary word ends. Letters are the keys of all other entries
+WORD_END = ""
+
+# Trie of ENGLISH_DICTIONARY, built the first time unspaced text is segmented
+_word_trie = None
+
+
+def get_word_trie():
+    """
+    Function returns a trie of all words in ENGLISH_DICTIONARY, building it on the first call.
+    Each node is a dictionary mapping the next letter to the child node,
+    nodes where a word ends also hold the WORD_END key.
+
+    Returns:
+        dict: the root node of the trie
+    """
+    global _word_trie
+
+    if _word_trie is None:
+        trie = {}
+        for word in ENGLISH_DICTIONARY:
+            node = trie
+            for letter in word:
+                node = node.setdefault(letter, {})
+            node[WORD_END] = True
+        _word_trie = trie
+
+    return _word_trie
+
+
+def segment_text(text):
+    """
+    Function finds the segmentation of text into dictionary words that covers the most characters.
+    Ties are broken in favour of fewer, longer words.
+    The text is walked once from the end, and at every position the trie gives all words starting there,
+    so the best segmentation of the rest of the text is already known for each of them.
+
+    Args:
+        text: a string of uppercase text
+
+    Returns:
+        tuple: the number of characters covered by words, and a list where the item at each position is
+            the length of the word chosen to start there, or 0 if that character is not part of a word
+    """
+    if metrics.ENABLED:
+        metrics.increment("segmenter_calls")
+    trie = get_word_trie()
+    text_length = len(text)
+
+    # covered[i] and word_count[i] describe the best segmentation of text[i:]
+    covered = [0] * (text_length + 1)
+    word_count = [0] * (text_length + 1)
+    word_lengths = [0] * (text_length + 1)
+
+    for start in range(text_length - 1, -1, -1):
+        # By default the character at start is left out of any word
+        best_covered = covered[start + 1]
+        best_count = word_count[start + 1]
+        best_length = 0
+
+        node = trie
+        for end in range(start, text_length):
+            node = node.get(text[end])
+            if node is None:
+                break
+            if WORD_END in node:
+                candidate_covered = end + 1 - start + covered[end + 1]
+                candidate_count = word_count[end + 1] + 1
+                if candidate_covered > best_covered or \
+                        (candidate_covered == best_covered and candidate_count < best_count):
+                    best_covered = candidate_covered
+                    best_count = candidate_count
+                    best_length = end + 1 - start
+
+        covered[start] = best_covered
+        word_count[start] = best_count
+        word_lengths[start] = best_length
+
+    return covered[0], word_lengths[:text_length]
+
+
+def word_coverage(text):
+    """
+    Function returns the fraction of the letters in a string covered by its best segmentation into
+    English words, without building the spaced string.
+    Only words of at least MIN_COVERAGE_WORD_LENGTH letters are counted.
+
+    Args:
+        text: a string of text, spaces and non-letters are ignored
+
+    Returns:
+        float: fraction between 0 and 1, 0 for text without letters
+    """
+    text = format_for_analysis(text, False)
+    if len(text) == 0:
+        return 0
+
+    word_lengths = segment_text(text)[1]
+    covered = 0
+    position = 0
+    while position < len(text):
+        word_length = word_lengths[position]
+        if word_length >= MIN_COVERAGE_WORD_LENGTH:
+            covered += word_length
+        position += max(word_length, 1)
+
+    return covered / len(text)
 
 
 def find_words_in_nospace(text):
     """
     Function takes a nonspaced English string and returns a spaced string.
+    Characters that are not part of any word are grouped together between the words.
 
     Args:
         text: a string of nonspaces text
@@ -123,37 +247,29 @@ def find_words_in_nospace(text):
     """
 
     text = format_for_analysis(text)
-    text_length = len(text)
+    word_lengths = segment_text(text)[1]
     words_list = []
     not_a_word_string = ""
 
     current_start_index = 0
-    longest_word_length = 13
 
-    # Outer loop continues until the start index reaches the end of the text
-    while current_start_index < text_length:
+    while current_start_index < len(text):
+        word_length = word_lengths[current_start_index]
 
-        # Inner loop provides the end index of the string slice
-        # It starts at the length of the longest word in the dictionary, and goes down from there
-        for word_length in reversed(range(longest_word_length)):
+        # characters outside of words are collected in the not_a_word_string buffer
+        if word_length == 0:
+            not_a_word_string += text[current_start_index]
+            current_start_index += 1
+            continue
 
-            word_candidate = text[current_start_index:min(current_start_index + word_length, text_length)]
+        # before we add the word to the list we clear the not_a_word_string buffer of non-English words
+        if not_a_word_string != "":
+            words_list.append(not_a_word_string)
+            not_a_word_string = ""
+        words_list.append(text[current_start_index:current_start_index + word_length])
+        current_start_index += word_length
 
-            # if the current slice is in the dictionary it's added to the list of words, and the start index is updated
-            if word_candidate in ENGLISH_DICTIONARY:
-                current_start_index += min(word_length, text_length)
-                # before we add the word to the list we clear the not_a_word_string buffer of non-English words
-                if not_a_word_string != "":
-                    words_list.append(not_a_word_string)
-                    not_a_word_string = ""
-                words_list.append(word_candidate)
-                break
-
-            # If we ended up with a candidate of length one that's not in the dictionary,
-            # we add it to the not_a_word_string buffer and increment the start index
-            elif len(word_candidate) == 1:
-                not_a_word_string += word_candidate
-                current_start_index += 1
-                break
+    if not_a_word_string != "":
+        words_list.append(not_a_word_string)
 
     return " ".join(words_list)
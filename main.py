@@ -1,7 +1,33 @@
+import argparse
+import sys
+import time
+import attackScheduler
+import cipherText
+import cribDrag
+import keySearch
 import vigenere
 from languageFunctions import check_for_spaces
 
 
+def decipher_with_known_key():
+    """
+    Deciphers a file with a key given on the command line, without any prompts.
+    The file is streamed, so it can be larger than the available memory.
+    """
+    parser = argparse.ArgumentParser(description="Decipher a Vigenere encrypted file with a known key.")
+    parser.add_argument("--key", required=True, help="the key, letters only")
+    parser.add_argument("--input", default="ciphertext.txt", help="cipher text file, defaults to %(default)s")
+    parser.add_argument("--output", default="plaintext.txt", help="plaintext file, defaults to %(default)s")
+    args = parser.parse_args()
+
+    if not args.key.isalpha():
+        parser.error("Key can only contain letters.")
+
+    letter_count = vigenere.decipher_file(args.input, args.output, args.key)
+    print("Deciphered {} letters with key {}. Plaintext saved to '{}'.".format(letter_count, args.key.upper(),
+                                                                                 args.output))
+
+
 def main():
     print("Welcome to Final Vigenere Crack Mk 2")
     print("Let's crack some Vigenere\n")
@@ -55,13 +81,46 @@ def main():
             else:
                 print("\nInput not recognized. Please try again.\n")
 
-    # Second crack - attempting a dictionary attack. Asks the user whether they want to try a dictionary attack
+    # Second crack - words the user expects in the plaintext, such as a header or a sign-off, are slid across the
+    # cipher text, and the keys they imply are tried. With a right guess this finds the key almost straight away
     spaces = check_for_spaces(ciphertext)
+    cribs = input("Input words or phrases you expect in the plaintext, separated by commas. If none are known "
+                  "leave it blank and press Enter\nCRIBS: ")
+    cribs = [crib for crib in cribs.split(",") if crib.strip() != ""]
+    if cribs:
+        print("\nAttempting crib drag...\n")
+        candidates = vigenere.find_english_candidates(ciphertext, cribDrag.find_crib_keys(ciphertext, cribs), spaces)
+        try:
+            key, plaintext = vigenere.confirm_candidates(candidates)
+        finally:
+            candidates.close()
+
+        if plaintext:
+            while True:
+                r = input(
+                    "\nInput 'save' if you'd like to save the plaintext, otherwise press 'Enter' to quit\nINPUT: ")
+                if r.lower() == "save" or r.lower() == 's':
+                    file = open("plaintext.txt", "w")
+                    file.write(plaintext)
+                    file.close()
+                    print("\nPlaintext saved to 'plaintext.txt. Closing session.")
+                    return
+                elif r == "":
+                    print("\nClosing session.")
+                    return
+                else:
+                    print("\nInput not recognized. Please try again.\n")
+
+        print("Failed to find a key using the cribs.\n")
+
+    # Third crack - attempting a dictionary attack. Asks the user whether they want to try a dictionary attack
     try_dict = input("Would you like to try a dictionary attack? Input 'yes' or 'y' to confirm. Input anything "
                      "else to continue\nINPUT:")
     if try_dict.lower() == "yes" or try_dict.lower() == "y":
         print("\nAttempting dictionary attack...\n")
-        key, plaintext = vigenere.dictionary_attack(ciphertext, spaces)
+        # the attack gives up once its time budget runs out, and the Kasiski/Babbage attack gets its turn
+        deadline = time.monotonic() + attackScheduler.DEFAULT_BUDGET
+        key, plaintext = vigenere.dictionary_attack(ciphertext, spaces, workers=None, deadline=deadline)
 
         if plaintext:
             while True:
@@ -79,17 +138,28 @@ def main():
                 else:
                     print("\nInput not recognized. Please try again.\n")
 
-    # Third crack - if dictionary attack failed, or the user chose not to do one, the program performs
+    # Fourth crack - if dictionary attack failed, or the user chose not to do one, the program performs
     # a Kasinski/Babbage attack
     print("\nAttempting Kasinski/Babbage attack.\n")
     spaces = check_for_spaces(ciphertext)
-    possible_key_lengths = vigenere.find_likely_key_lengths(ciphertext, 6)
-    possible_keys = []
+    # the text is normalized once, and the column statistics worked out while ranking the key lengths are reused
+    # to rank the key letters of every likely length
+    analysed_text = cipherText.Ciphertext(ciphertext)
+    possible_key_lengths = vigenere.find_likely_key_lengths(analysed_text, 6, use_coincidence=True)
+
+    # keys for every likely length are produced lazily, best first, while brute_force_with_list tries them.
+    # A key repeating a shorter one that was already tried is skipped
+    possible_keys = vigenere.find_keys_for_lengths(analysed_text, possible_key_lengths)
 
-    for key_length in possible_key_lengths:
-        possible_keys.extend(vigenere.find_possible_keys(ciphertext, key_length))
+    key, plaintext = vigenere.brute_force_with_list(analysed_text, possible_keys, spaces, workers=None)
 
-    key, plaintext = vigenere.brute_force_with_list(ciphertext, possible_keys, spaces)
+    # Fifth crack - a long key leaves too few letters in each column for frequency analysis, so the program
+    # searches for the key of each likely length by simulated annealing instead
+    if not plaintext:
+        print("\nAttempting key search by simulated annealing.\n")
+        key, plaintext = vigenere.confirm_candidates(keySearch.find_key_candidates(ciphertext))
+        if not plaintext:
+            print("Failed to find a key using key search.")
 
     if plaintext:
         while True:
@@ -109,4 +179,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # With command line arguments the file is deciphered with the given key, otherwise the interactive session starts
+    if len(sys.argv) > 1:
+        decipher_with_known_key()
+    else:
+        main()
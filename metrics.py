@@ -0,0 +1,225 @@
+import cProfile
+import contextlib
+import json
+import time
+
+# Nothing is recorded unless this is True. Hot code checks it before calling into this module,
+# so turned off the instrumentation costs one attribute lookup
+ENABLED = False
+
+# Seconds spent in each stage, the number of times each stage ran, and the keys evaluated inside the timed code of
+# the stages that try keys. Throughput is only ever calculated from the keys and the seconds of the same stage
+_stage_seconds = {}
+_stage_calls = {}
+_stage_keys = {}
+_counters = {}
+
+# Returned by timed() while recording is off, so no timer object is created
+_NOT_TIMED = contextlib.nullcontext()
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    """
+    Function clears everything recorded so far
+    """
+    _stage_seconds.clear()
+    _stage_calls.clear()
+    _stage_keys.clear()
+    _counters.clear()
+
+
+def increment(name, amount=1):
+    """
+    Function adds to a counter, such as keys_tried or is_english_calls
+
+    Args:
+        name: string, name of the counter
+        amount: int, defaults to 1
+    """
+    if ENABLED:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def add_time(stage, seconds, calls=1):
+    """
+    Function adds time spent in a stage of the cracking pipeline
+
+    Args:
+        stage: string, name of the stage, such as key_length_search
+        seconds: float, time spent in the stage
+        calls: int, number of times the stage ran in that time, defaults to 1
+    """
+    if ENABLED:
+        _stage_seconds[stage] = _stage_seconds.get(stage, 0) + seconds
+        _stage_calls[stage] = _stage_calls.get(stage, 0) + calls
+
+
+def add_keys(stage, amount):
+    """
+    Function records the number of keys evaluated inside the timed code of a stage, see timed.
+    The stage's keys per second are these keys divided by its seconds.
+
+    Args:
+        stage: string, name of the stage, such as english_checking
+        amount: int, number of keys
+    """
+    if ENABLED:
+        _stage_keys[stage] = _stage_keys.get(stage, 0) + amount
+
+
+@contextlib.contextmanager
+def _stage_timer(stage):
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(stage, time.perf_counter() - start_time)
+
+
+def timed(stage):
+    """
+    Function returns a context manager recording the wall time of the code inside it as a stage. For example:
+        with metrics.timed("key_length_search"):
+            ...
+
+    Args:
+        stage: string, name of the stage
+    """
+    if not ENABLED:
+        return _NOT_TIMED
+    return _stage_timer(stage)
+
+
+def take():
+    """
+    Function returns everything recorded so far in a form that can be sent between processes, and clears it.
+    Worker processes use it to hand their records to the main process, which adds them up with merge().
+
+    Returns:
+        dict: stage seconds, stage calls and counters
+    """
+    records = {"stage_seconds": dict(_stage_seconds), "stage_calls": dict(_stage_calls),
+               "stage_keys": dict(_stage_keys), "counters": dict(_counters)}
+    reset()
+    return records
+
+
+def merge(records):
+    """
+    Function adds records returned by take(), usually in another process, to the ones in this process
+
+    Args:
+        records: dict returned by take()
+    """
+    if not ENABLED or records is None:
+        return
+
+    for stage, seconds in records["stage_seconds"].items():
+        add_time(stage, seconds, records["stage_calls"].get(stage, 0))
+    for stage, amount in records["stage_keys"].items():
+        add_keys(stage, amount)
+    for name, amount in records["counters"].items():
+        increment(name, amount)
+
+
+def report():
+    """
+    Function summarizes everything recorded so far
+
+    Returns:
+        dict: "stages" maps each stage to its seconds and calls, and for the stages that try keys also to the keys
+            evaluated in them and their keys per second. "counters" holds every counter, and "keys_per_second" is
+            the keys evaluated by all of those stages per second spent in them, or None if no keys were evaluated
+    """
+    stages = {}
+    for stage in sorted(_stage_seconds):
+        stages[stage] = {"seconds": _stage_seconds[stage], "calls": _stage_calls.get(stage, 0)}
+        if stage in _stage_keys:
+            stages[stage]["keys"] = _stage_keys[stage]
+            stages[stage]["keys_per_second"] = _keys_per_second(_stage_keys[stage], _stage_seconds[stage])
+
+    keys_per_second = None
+    if _stage_keys:
+        keys_per_second = _keys_per_second(sum(_stage_keys.values()),
+                                           sum(_stage_seconds.get(stage, 0) for stage in _stage_keys))
+
+    return {"stages": stages, "counters": dict(sorted(_counters.items())), "keys_per_second": keys_per_second}
+
+
+def _keys_per_second(keys, seconds):
+    return keys / seconds if seconds > 0 else None
+
+
+def to_json():
+    """
+    Returns:
+        string: report() as JSON
+    """
+    return json.dumps(report(), indent=2)
+
+
+def to_prometheus(prefix="vigenere"):
+    """
+    Function formats report() in the Prometheus text exposition format
+
+    Args:
+        prefix: string put in front of every metric name, defaults to "vigenere"
+
+    Returns:
+        string: one line per value, each metric preceded by its TYPE line
+    """
+    summary = report()
+    lines = ["# TYPE {}_stage_seconds_total counter".format(prefix)]
+    for stage, values in summary["stages"].items():
+        lines.append('{}_stage_seconds_total{{stage="{}"}} {}'.format(prefix, stage, values["seconds"]))
+
+    lines.append("# TYPE {}_stage_calls_total counter".format(prefix))
+    for stage, values in summary["stages"].items():
+        lines.append('{}_stage_calls_total{{stage="{}"}} {}'.format(prefix, stage, values["calls"]))
+
+    lines.append("# TYPE {}_stage_keys_total counter".format(prefix))
+    for stage, values in summary["stages"].items():
+        if "keys" in values:
+            lines.append('{}_stage_keys_total{{stage="{}"}} {}'.format(prefix, stage, values["keys"]))
+
+    for name, value in summary["counters"].items():
+        lines.append("# TYPE {}_{}_total counter".format(prefix, name))
+        lines.append("{}_{}_total {}".format(prefix, name, value))
+
+    if summary["keys_per_second"] is not None:
+        lines.append("# TYPE {}_keys_per_second gauge".format(prefix))
+        lines.append("{}_keys_per_second {}".format(prefix, summary["keys_per_second"]))
+
+    return "\n".join(lines) + "\n"
+
+
+@contextlib.contextmanager
+def profiled(output_path=None):
+    """
+    Context manager running the code inside it under cProfile, and saving the statistics to output_path
+    for pstats or snakeviz. Does nothing if output_path is None.
+
+    Args:
+        output_path: optional path of the profile file
+    """
+    if output_path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output_path)
@@ -0,0 +1,207 @@
+import heapq
+import cipherText
+import coincidence
+import kasiski
+import languageFunctions
+import metrics
+import ngramFitness
+import vigenere
+
+# Filler put after every message to make it a multiple of the key length long. It is neither a letter counted in
+# the histograms nor one the decipher tables change, so it is removed again after deciphering
+PAD = b"."
+
+# Number of letters, from the first messages, that every key is deciphered and scored on before the best keys
+# are scored on every message
+FITNESS_LETTERS = 300
+
+# Number of keys scored on every message, the best of them by n-gram fitness on FITNESS_LETTERS first
+KEYS_SCORED_IN_FULL = 10
+
+
+class MessageSet:
+    """
+    Several messages enciphered with the same key, each starting at the first letter of the key.
+    The messages are too short to be cracked one by one, but together the columns of every key position hold
+    the letters of all of them, so they are analysed as one text: the letter histograms of the columns and the
+    Kasiski spacings are counted across every message in a single pass over their letters, the key is solved
+    once, and every message is deciphered with it in a single pass too.
+    The cost of cracking them therefore grows with the number of letters, not with the number of messages.
+    """
+
+    def __init__(self, messages):
+        """
+        Args:
+            messages: an iterable of strings or cipherText.Ciphertext, the cipher texts in any order
+        """
+        self.messages = [cipherText.as_ciphertext(message) for message in messages]
+        self.message_lengths = [len(message) for message in self.messages]
+        self._histograms = {}
+
+    def __len__(self):
+        return sum(self.message_lengths)
+
+    def aligned_letters(self, key_length, letter_count=None):
+        """
+        Function joins the letters of the messages, padding each one with PAD to a multiple of the key length,
+        so every letter of the result lies in the column of its key position, the same as in its own message
+
+        Args:
+            key_length: int, length of the key
+            letter_count: optional int, the messages are only joined until this many bytes are reached
+
+        Returns:
+            bytes: the aligned letters
+        """
+        parts = []
+        joined_length = 0
+        for message in self.messages:
+            if letter_count is not None and joined_length >= letter_count:
+                break
+            parts.append(message.letters + PAD * (-len(message) % key_length))
+            joined_length += len(parts[-1])
+        return b"".join(parts)
+
+    def column_histograms(self, key_length):
+        """
+        Function counts the letters of every column across all messages, see cipherText.Ciphertext.column_histograms.
+        The histograms of a key length are added up from those of a known multiple instead of being counted again.
+
+        Returns:
+            tuple: a tuple of 26 letter counts for every column, A first, read-only like those of a Ciphertext
+        """
+        if key_length not in self._histograms:
+            multiples = [length for length in self._histograms if length % key_length == 0]
+            if multiples:
+                folded = cipherText.fold_histograms(self._histograms[min(multiples)], key_length)
+                self._histograms[key_length] = tuple(tuple(histogram) for histogram in folded)
+            else:
+                # PAD isn't a letter, so it isn't counted
+                aligned = cipherText.Ciphertext.from_prepared(self.aligned_letters(key_length))
+                self._histograms[key_length] = aligned.column_histograms(key_length)
+        return self._histograms[key_length]
+
+    def rank_key_lengths(self, how_many=6, max_key_length=coincidence.DEFAULT_MAX_KEY_LENGTH):
+        """
+        Function ranks key lengths by Kasiski examination across the messages and by the index of coincidence of
+        the joint columns, see coincidence.merge_with_kasiski
+
+        Args:
+            how_many: int, number of key lengths returned, defaults to 6
+            max_key_length: int, the longest key length to be considered, defaults to 40
+
+        Returns:
+            list: a list of integers denoting likely key lengths
+        """
+        # a key longer than the longest message only ever has its first letters used
+        max_key_length = min(max_key_length, max(self.message_lengths, default=0), len(self) // 2)
+
+        with metrics.timed("key_length_search"):
+            letter_values = [letter - 65 for message in self.messages for letter in message.letters]
+            spacing_counts = kasiski.find_repeat_spacings(letter_values, message_lengths=self.message_lengths)
+            kasiski_ranking = kasiski.rank_spacings(spacing_counts, max_key_length=max_key_length)
+
+            scores = coincidence.score_key_lengths(self.column_histograms,
+                                                   coincidence.longest_scored_key_length(len(self), max_key_length))
+            ranking = coincidence.merge_with_kasiski(kasiski_ranking, scores, how_many)
+
+        return [key_length for key_length, score in ranking]
+
+    def rank_key_letters(self, key_length):
+        """
+        Function ranks the letters of every key position by the joint histograms of their columns,
+        see vigenere.rank_key_letters
+
+        Returns:
+            list: a list of (letter, score) tuples for every key position, the most likely letter first
+        """
+        return vigenere.rank_histogram_letters(self.column_histograms(key_length))
+
+    def find_keys(self, key_lengths, max_keys=vigenere.DEFAULT_MAX_KEYS):
+        """
+        Generator producing the most likely keys of every key length in turn from the joint columns, reduced to their
+        vigenere.minimal_period and each of them once, see vigenere.find_keys_for_lengths
+
+        Args:
+            key_lengths: a list of ints, the key lengths in the order they are tried
+            max_keys: int, the most keys produced for each key length, defaults to vigenere.DEFAULT_MAX_KEYS
+
+        Yields:
+            string: the next key
+        """
+        yield from vigenere.find_keys_for_lengths(self, key_lengths, max_keys)
+
+    def decipher(self, key):
+        """
+        Function deciphers every message with the key in one pass over their aligned letters
+
+        Args:
+            key: string containing the key
+
+        Returns:
+            list: the plaintext of every message, with its spaces, in the order of the messages
+        """
+        plaintext = vigenere.decipher_letters(self.aligned_letters(len(key)), key)
+        plaintexts = []
+        start = 0
+        for message in self.messages:
+            plaintexts.append(vigenere.restore_spaces(plaintext[start:start + len(message)], message.word_lengths))
+            start += len(message) + (-len(message) % len(key))
+        return plaintexts
+
+    def rank_keys(self, keys, how_many=KEYS_SCORED_IN_FULL):
+        """
+        Function ranks keys by the n-gram fitness of the first FITNESS_LETTERS letters they decipher,
+        then scores the best of them on every message, see vigenere.rank_keys_by_fitness
+
+        Args:
+            keys: an iterable of strings, each a key to be tried
+            how_many: int, number of keys scored on every message, defaults to KEYS_SCORED_IN_FULL
+
+        Returns:
+            list: a list of (key, plaintexts, score) tuples, the highest n-gram fitness first
+        """
+        table = ngramFitness.get_table()
+        # the window of every key length is aligned once, for all keys of that length
+        windows = {}
+        scores = []
+
+        with metrics.timed("fitness_scoring"):
+            for key in keys:
+                if len(key) not in windows:
+                    windows[len(key)] = self.aligned_letters(len(key), FITNESS_LETTERS)
+                letters = vigenere.decipher_letters(windows[len(key)], key).translate(None, PAD)
+                scores.append((ngramFitness.score_letters(letters, table), key))
+
+        if metrics.ENABLED:
+            metrics.add_keys("fitness_scoring", len(scores))
+            metrics.increment("keys_tried", len(scores))
+
+        ranked = []
+        for score, key in heapq.nlargest(how_many, scores):
+            plaintexts = self.decipher(key)
+            ranked.append((key, plaintexts, ngramFitness.score_text(" ".join(plaintexts), table)))
+        ranked.sort(key=lambda candidate: candidate[2], reverse=True)
+
+        return ranked
+
+    def crack(self, how_many=6, max_keys=vigenere.DEFAULT_MAX_KEYS):
+        """
+        Function finds the shared key of the messages: the key lengths are ranked, the most likely keys of each
+        are ranked by n-gram fitness, and the best key is checked for English on all messages together
+
+        Args:
+            how_many: int, number of likely key lengths tried, defaults to 6
+            max_keys: int, the most keys tried for each key length, defaults to vigenere.DEFAULT_MAX_KEYS
+
+        Returns:
+            tuple: the best key, the plaintext of every message and the English score of all plaintexts together,
+                see languageFunctions.english_score. None, [] and 0 if the messages have too few letters
+        """
+        ranked = self.rank_keys(self.find_keys(self.rank_key_lengths(how_many), max_keys))
+        if not ranked:
+            return None, [], 0
+
+        key, plaintexts = ranked[0][:2]
+        spaces = any(message.has_spaces for message in self.messages)
+        return key, plaintexts, languageFunctions.english_score(" ".join(plaintexts), spaces)
@@ -0,0 +1,230 @@
+import hashlib
+import math
+import os
+import string
+import struct
+from array import array
+from collections import Counter
+import cipherText
+import dictionaryIndex
+
+# Length of the letter sequences scored by default. Quadgrams tell English from nearly right decryptions
+# much better than single letter frequencies, and their table still fits in under 2 MB
+DEFAULT_N = 4
+
+# Count given to n-grams that never appear in the corpus, so that they get a finite, very low log probability
+FLOOR_COUNT = 0.01
+
+# Word list the table is built from by default
+DICTIONARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dictionary.txt")
+
+# A table file starts with a magic string, n, and a digest of the paths, sizes and modification times of the
+# corpus files it was built from. 26 ** n little-endian 32-bit floats follow, the log10 probability of every
+# n-gram, indexed by the n-gram read as a number in base 26
+MAGIC = b"VCNGR001"
+HEADER_FORMAT = "<8sI32s"
+
+# Translation table turning uppercase letters into their values between 0 and 25, the values encode_ngrams takes
+LETTER_VALUES = bytes.maketrans(string.ascii_uppercase.encode("ascii"), bytes(range(26)))
+
+# Tables loaded in this process, by n
+_tables = {}
+
+# Lowest log probability of every table scored in this process, by id. The table is kept with it,
+# so its id can't be reused by another table
+_floors = {}
+
+
+def table_path(n=DEFAULT_N):
+    """
+    Returns:
+        string: path of the cached table for n-grams of length n, next to the dictionary
+    """
+    return os.path.join(os.path.dirname(DICTIONARY_PATH), "ngrams{}.bin".format(n))
+
+
+def source_digest(source_paths):
+    """
+    Function identifies the current version of the corpus files, so a cached table can be rebuilt when they change
+
+    Returns:
+        bytes: SHA-256 digest of the path, size and modification time of every file
+    """
+    digest = hashlib.sha256()
+    for path in source_paths:
+        path_stat = os.stat(path)
+        digest.update("{}\0{}\0{}\0".format(os.path.abspath(path), path_stat.st_size,
+                                             path_stat.st_mtime_ns).encode("utf-8"))
+    return digest.digest()
+
+
+def encode_ngrams(values, n=DEFAULT_N):
+    """
+    Function turns letter values into the number of every n-gram in base 26, building all of them
+    in whole passes over the text instead of one step per n-gram.
+    Codes of 2-grams are built from codes of letters, codes of 4-grams from codes of 2-grams and so on,
+    so quadgrams take two passes. Lengths that aren't a power of two are put together from several of these.
+
+    Args:
+        values: bytes or list of letter values between 0 and 25
+        n: int, length of the n-grams, defaults to DEFAULT_N
+
+    Returns:
+        list: one int for every n-gram, in the order they appear
+    """
+    codes = list(values)
+    length = 1
+    result = None
+    result_length = 0
+
+    while True:
+        if n & 1:
+            if result is None:
+                result = codes
+            else:
+                result = [code * 26 ** length + next_code for code, next_code in zip(result, codes[result_length:])]
+            result_length += length
+        n >>= 1
+        if n == 0:
+            return result
+        codes = [code * 26 ** length + next_code for code, next_code in zip(codes, codes[length:])]
+        length *= 2
+
+
+def build_table(source_paths, n=DEFAULT_N):
+    """
+    Function counts the n-grams of English text and turns the counts into log10 probabilities.
+    A word list such as dictionary.txt only contributes n-grams inside each word, while a running text
+    contributes n-grams across word boundaries too, so every other file is read as one stream of letters.
+
+    Args:
+        source_paths: a list of paths to the dictionary and any other English corpus files
+        n: int, length of the n-grams, defaults to DEFAULT_N
+
+    Returns:
+        array: 26 ** n floats, the log10 probability of every n-gram
+    """
+    counts = Counter()
+    for path in source_paths:
+        with open(path, "r") as source_file:
+            text = source_file.read().upper()
+
+        if os.path.abspath(path) == os.path.abspath(DICTIONARY_PATH):
+            runs = [cipherText.NOT_LETTER.sub("", word) for word in text.split()]
+        else:
+            runs = [cipherText.NOT_LETTER.sub("", text)]
+        for run in runs:
+            counts.update(encode_ngrams(run.encode("ascii").translate(LETTER_VALUES), n))
+
+    total = sum(counts.values()) or 1
+    table = array("f", [math.log10(FLOOR_COUNT / total)]) * 26 ** n
+    for code, count in counts.items():
+        table[code] = math.log10(count / total)
+
+    return table
+
+
+def load_table(n=DEFAULT_N, corpus_paths=()):
+    """
+    Function returns the log probability table built from dictionary.txt and any extra corpus files.
+    The table is built once and cached on disk, and rebuilt only when one of the files changes.
+
+    Args:
+        n: int, length of the n-grams, defaults to DEFAULT_N
+        corpus_paths: an iterable of paths to extra English text, defaults to none
+
+    Returns:
+        array: 26 ** n floats, see build_table
+    """
+    source_paths = [DICTIONARY_PATH] + list(corpus_paths)
+    path = table_path(n)
+    digest = source_digest(source_paths)
+    header_size = struct.calcsize(HEADER_FORMAT)
+
+    try:
+        with open(path, "rb") as table_file:
+            header = table_file.read(header_size)
+            if len(header) == header_size and struct.unpack(HEADER_FORMAT, header) == (MAGIC, n, digest):
+                table = array("f")
+                table.fromfile(table_file, 26 ** n)
+                return table
+    except (OSError, EOFError):
+        pass
+
+    table = build_table(source_paths, n)
+    try:
+        dictionaryIndex.write_index(struct.pack(HEADER_FORMAT, MAGIC, n, digest) + table.tobytes(), path)
+    except OSError:
+        # the table is still used, it just has to be built again by the next process
+        pass
+
+    return table
+
+
+def get_table(n=DEFAULT_N):
+    """
+    Function returns the table for n-grams of length n built from dictionary.txt, loading it on the first call
+    """
+    if n not in _tables:
+        _tables[n] = load_table(n)
+    return _tables[n]
+
+
+def table_floor(table):
+    """
+    Function returns the lowest log probability in a table, the score of an n-gram that never appears in the corpus.
+    It is looked up once per table, rather than scanning all 26 ** n values on every call.
+    """
+    entry = _floors.get(id(table))
+    if entry is None:
+        entry = _floors[id(table)] = (table, min(table))
+    return entry[1]
+
+
+def score_letters(letters, table=None, n=DEFAULT_N):
+    """
+    Function scores how English a text is by the average log10 probability of its n-grams.
+    No segmentation is needed, and unlike languageFunctions.is_english the score is continuous,
+    so candidates can be ranked against each other.
+
+    Args:
+        letters: bytes of uppercase letters without spaces
+        table: optional table returned by load_table, defaults to the one of get_table(n)
+        n: int, length of the n-grams, defaults to DEFAULT_N
+
+    Returns:
+        float: the average log10 probability of an n-gram, the higher the more English.
+            Text shorter than n gets the lowest score in the table
+    """
+    if table is None:
+        table = get_table(n)
+
+    codes = encode_ngrams(letters.translate(LETTER_VALUES), n)
+    if not codes:
+        return table_floor(table)
+    return sum(map(table.__getitem__, codes)) / len(codes)
+
+
+def score_text(text, table=None, n=DEFAULT_N):
+    """
+    Function scores a string with score_letters, ignoring case and everything but letters
+    """
+    return score_letters(cipherText.NOT_LETTER.sub("", text.upper()).encode("ascii"), table, n)
+
+
+def score_batch(texts, table=None, n=DEFAULT_N):
+    """
+    Function scores many decrypted candidates with the same table
+
+    Args:
+        texts: an iterable of strings, or of bytes of uppercase letters
+        table: optional table returned by load_table, defaults to the one of get_table(n)
+        n: int, length of the n-grams, defaults to DEFAULT_N
+
+    Returns:
+        list: one score for every text, see score_letters
+    """
+    if table is None:
+        table = get_table(n)
+    return [score_letters(text, table, n) if isinstance(text, bytes) else score_text(text, table, n)
+            for text in texts]
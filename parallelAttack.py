@@ -0,0 +1,117 @@
+import itertools
+import multiprocessing
+import os
+from collections import deque
+import metrics
+
+# Number of items handed to a worker process at a time
+CHUNK_SIZE = 2048
+
+# How many chunks per worker are allowed to be queued or running at once
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+# State given to every worker process once, by the pool initializer
+_worker_state = {}
+
+
+def split_into_chunks(items, chunk_size=CHUNK_SIZE, first_chunk_size=None):
+    """
+    Generator that splits an iterable into lists of at most chunk_size items,
+    without building a list of the whole iterable first.
+
+    Args:
+        items: an iterable to be split
+        chunk_size: int, the maximum number of items in a chunk
+        first_chunk_size: optional int, size of the first chunk. Each following chunk is twice as large,
+            up to chunk_size, so that the first items are handled quickly when they are the most promising ones
+
+    Yields:
+        list: the next chunk of items
+    """
+    iterator = iter(items)
+    next_size = chunk_size if first_chunk_size is None else min(first_chunk_size, chunk_size)
+    while True:
+        chunk = list(itertools.islice(iterator, next_size))
+        if not chunk:
+            return
+        yield chunk
+        next_size = min(next_size * 2, chunk_size)
+
+
+def _init_worker(evaluate, shared, stop_event, metrics_enabled=False):
+    """
+    Pool initializer. Stores the evaluation function, the data shared by all chunks and the stop event
+    in the worker, so they are sent to every process once instead of being pickled with each task.
+    Module level data such as languageFunctions.ENGLISH_DICTIONARY is loaded by the worker itself.
+    Metrics are recorded in the worker if they are recorded in the process that started the pool.
+    """
+    _worker_state["evaluate"] = evaluate
+    _worker_state["shared"] = shared
+    _worker_state["stop_event"] = stop_event
+    metrics.ENABLED = metrics_enabled
+
+
+def _evaluate_chunk(chunk):
+    """
+    Evaluates one chunk inside a worker process, unless the search has already been stopped.
+
+    Returns:
+        tuple: number of items in the chunk, the result for the chunk, None if the search was stopped,
+            and the metrics recorded while evaluating it, None if metrics are turned off
+    """
+    if _worker_state["stop_event"].is_set():
+        return len(chunk), None, None
+    result = _worker_state["evaluate"](_worker_state["shared"], chunk)
+    return len(chunk), result, metrics.take() if metrics.ENABLED else None
+
+
+def evaluate_in_parallel(evaluate, shared, items, workers=None, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Generator that splits items into chunks and evaluates them across a pool of worker processes.
+    The result of each chunk is yielded in the order of the items. Only a few chunks per worker are queued at once,
+    so items can be a lazy iterable of any length.
+    When the generator is closed, for example because the caller accepted a result, the workers are told to
+    skip their remaining chunks and the pool is shut down.
+
+    Args:
+        evaluate: a module level function taking shared and a list of items, and returning the chunk's result
+        shared: data needed by every chunk, sent to each worker process once
+        items: an iterable of items to be evaluated
+        workers: int, number of worker processes, defaults to the number of CPUs
+        chunk_size: int, number of items evaluated by a worker at a time
+        progress: optional function called with the total number of items evaluated so far
+
+    Yields:
+        the result returned by evaluate for each chunk
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    stop_event = multiprocessing.Event()
+    pool = multiprocessing.Pool(workers, _init_worker, (evaluate, shared, stop_event, metrics.ENABLED))
+    pending = deque()
+    evaluated_count = 0
+
+    try:
+        chunks = split_into_chunks(items, chunk_size)
+        for chunk in itertools.islice(chunks, workers * CHUNKS_IN_FLIGHT_PER_WORKER):
+            pending.append(pool.apply_async(_evaluate_chunk, (chunk,)))
+
+        while pending:
+            chunk_length, result, records = pending.popleft().get()
+            metrics.merge(records)
+
+            # Keep the pool busy while the result of this chunk is handed to the caller
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(pool.apply_async(_evaluate_chunk, (chunk,)))
+
+            evaluated_count += chunk_length
+            if progress is not None:
+                progress(evaluated_count)
+
+            yield result
+    finally:
+        # Cooperative cancellation: queued chunks return straight away once the event is set
+        stop_event.set()
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import sqlite3
+import time
+import cipherText
+
+# Most entries kept in the cache. Once there are more, the least recently used ones are evicted
+DEFAULT_MAX_ENTRIES = 100000
+
+# Number of letters hashed into the prefix fingerprint of a cracked message. A longer capture of the same
+# transmission starts with the same letters, so the key of the earlier message can be tried on it straight away
+PREFIX_LETTERS = 100
+
+# Number of entries a ResultCache stores between two evictions, see ResultCache.prune. Counting the entries is
+# a scan of the whole table, so it isn't done on every insert, and the cache can exceed its bound by up to this many
+# entries per process in between
+PRUNE_INTERVAL = 100
+
+# Seconds a connection waits for another process writing to the cache
+BUSY_TIMEOUT = 30
+
+# Kinds of entries, each stored with the parameters it was computed with
+RESULT = "result"
+KEY_LENGTHS = "key_lengths"
+RANKED_LETTERS = "ranked_letters"
+
+
+def fingerprint(text):
+    """
+    Function hashes text after normalizing it the same way as languageFunctions.format_for_analysis,
+    so case, punctuation and surrounding whitespace don't change the fingerprint
+
+    Args:
+        text: string or cipherText.Ciphertext to be hashed
+
+    Returns:
+        string: hexadecimal SHA-256 digest
+    """
+    if isinstance(text, cipherText.Ciphertext):
+        normalized = text.spaced
+    else:
+        normalized = cipherText.NOT_LETTER_OR_SPACE.sub("", text.upper()).strip()
+    return hashlib.sha256(normalized.encode("ascii")).hexdigest()
+
+
+def prefix_fingerprint(text):
+    """
+    Function hashes the first PREFIX_LETTERS letters of text, ignoring spaces
+
+    Args:
+        text: string or cipherText.Ciphertext to be hashed
+
+    Returns:
+        string: hexadecimal SHA-256 digest, or None if the text has fewer than PREFIX_LETTERS letters
+    """
+    if isinstance(text, cipherText.Ciphertext):
+        letters = text.letters
+    else:
+        letters = cipherText.NOT_LETTER.sub("", text.upper()).encode("ascii")
+    if len(letters) < PREFIX_LETTERS:
+        return None
+    return hashlib.sha256(letters[:PREFIX_LETTERS]).hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded cache of cracked keys and intermediate analysis results, stored in an SQLite database.
+    Entries are keyed by the fingerprint of the normalized cipher text and evicted least recently used first,
+    every PRUNE_INTERVAL insertions and when the cache is closed.
+    Several processes can share one database file, each with its own ResultCache.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._puts_since_prune = 0
+        self._connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS entries ("
+                                 "kind TEXT NOT NULL, fingerprint TEXT NOT NULL, parameters TEXT NOT NULL, "
+                                 "prefix TEXT, value TEXT NOT NULL, last_used REAL NOT NULL, "
+                                 "PRIMARY KEY (kind, fingerprint, parameters))")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_prefix ON entries (prefix)")
+
+    def close(self):
+        if self._puts_since_prune:
+            self.prune()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, kind, cipher_text, parameters=()):
+        """
+        Function looks up an entry and marks it as recently used
+
+        Args:
+            kind: string, the kind of entry, such as KEY_LENGTHS
+            cipher_text: string or cipherText.Ciphertext the entry was computed from
+            parameters: JSON serializable parameters the entry was computed with, defaults to none
+
+        Returns:
+            the cached value, or None if there is no entry
+        """
+        entry_key = (kind, fingerprint(cipher_text), json.dumps(parameters))
+        row = self._connection.execute("SELECT value FROM entries WHERE kind = ? AND fingerprint = ? "
+                                       "AND parameters = ?", entry_key).fetchone()
+        if row is None:
+            return None
+
+        self._connection.execute("UPDATE entries SET last_used = ? WHERE kind = ? AND fingerprint = ? "
+                                 "AND parameters = ?", (time.time(),) + entry_key)
+        return json.loads(row[0])
+
+    def put(self, kind, cipher_text, value, parameters=(), prefix=None):
+        """
+        Function stores an entry, replacing any entry of the same kind, cipher text and parameters.
+        Every PRUNE_INTERVAL entries the least recently used entries are evicted if the cache is full
+
+        Args:
+            kind: string, the kind of entry, such as KEY_LENGTHS
+            cipher_text: string or cipherText.Ciphertext the entry was computed from
+            value: JSON serializable value to be stored
+            parameters: JSON serializable parameters the entry was computed with, defaults to none
+            prefix: optional prefix fingerprint the entry can also be found by, see keys_with_prefix
+        """
+        self._connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                                 (kind, fingerprint(cipher_text), json.dumps(parameters), prefix,
+                                  json.dumps(value), time.time()))
+
+        self._puts_since_prune += 1
+        if self._puts_since_prune >= PRUNE_INTERVAL:
+            self.prune()
+
+    def prune(self):
+        """
+        Function evicts the least recently used entries until at most max_entries are left
+        """
+        self._puts_since_prune = 0
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._connection.execute("DELETE FROM entries WHERE rowid IN "
+                                     "(SELECT rowid FROM entries ORDER BY last_used LIMIT ?)", (excess,))
+
+    def get_result(self, cipher_text):
+        """
+        Returns:
+            dict: the cached "key", "plaintext" and English "score" of the cipher text, or None
+        """
+        return self.get(RESULT, cipher_text)
+
+    def put_result(self, cipher_text, key, plaintext, score):
+        """
+        Function stores the key, plaintext and English score of a cracked cipher text,
+        findable by its prefix fingerprint as well
+        """
+        self.put(RESULT, cipher_text, {"key": key, "plaintext": plaintext, "score": score},
+                 prefix=prefix_fingerprint(cipher_text))
+
+    def keys_with_prefix(self, cipher_text):
+        """
+        Function finds the keys of cracked messages that start with the same PREFIX_LETTERS letters as the
+        cipher text, such as a shorter capture of the same transmission. The keys still need to be checked.
+
+        Returns:
+            list: keys, most recently used first
+        """
+        prefix = prefix_fingerprint(cipher_text)
+        if prefix is None:
+            return []
+
+        rows = self._connection.execute("SELECT value FROM entries WHERE kind = ? AND prefix = ? "
+                                        "ORDER BY last_used DESC", (RESULT, prefix)).fetchall()
+        return [json.loads(value)["key"] for value, in rows]
@@ -0,0 +1,52 @@
+# The nine most common letters make up roughly 70% of English text, but only 9/26 of random letters
+COMMON_LETTERS = b"ETAOINSHR"
+
+# Each stage is a tuple of the number of letters deciphered from the start of the text,
+# and the lowest share of common letters a key needs in that window to reach the next stage.
+# Wrong keys decipher into close to random letters, so the first stage rejects most of them after 40 letters
+DEFAULT_STAGES = ((40, 0.4), (200, 0.5))
+
+# Number of characters at the start of a deciphered text checked with is_english before the whole text is checked
+ENGLISH_CHECK_WINDOW = 1000
+
+
+def common_letter_fraction(letters):
+    """
+    Function returns the share of the letters that are among the most common English letters
+
+    Args:
+        letters: bytes of uppercase letters
+
+    Returns:
+        float: fraction between 0 and 1, 0 for empty input
+    """
+    if len(letters) == 0:
+        return 0
+
+    return 1 - len(letters.translate(None, COMMON_LETTERS)) / len(letters)
+
+
+def filter_keys(letters, keys, decipher, stages=DEFAULT_STAGES):
+    """
+    Function runs keys through the early-reject stages. In each stage only a prefix window of the text is
+    deciphered, and keys producing too few common English letters are dropped before the next, longer window.
+
+    Args:
+        letters: bytes of uppercase cipher text letters, as returned by vigenere.prepare_cipher_text
+        keys: a list of strings, each a key to be tried
+        decipher: function taking bytes of letters and a key and returning the deciphered bytes,
+            such as vigenere.decipher_letters
+        stages: a sequence of (window, threshold) tuples, defaults to DEFAULT_STAGES
+
+    Returns:
+        tuple: a list of keys that survived every stage, and a list with the number of keys entering
+            the first stage followed by the number of survivors of each stage
+    """
+    survivor_counts = [len(keys)]
+
+    for window, threshold in stages:
+        prefix = letters[:window]
+        keys = [key for key in keys if common_letter_fraction(decipher(prefix, key)) >= threshold]
+        survivor_counts.append(len(keys))
+
+    return keys, survivor_counts
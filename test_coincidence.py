@@ -0,0 +1,36 @@
+import unittest
+import coincidence
+
+
+class RankingTest(unittest.TestCase):
+    def test_merge_rankings_orders_by_reciprocal_rank(self):
+        kasiski_ranking = [(2, 50), (6, 40), (3, 30)]
+        coincidence_ranking = [(6, 0.066), (3, 0.06), (12, 0.05)]
+        ranking = coincidence.merge_rankings(kasiski_ranking, coincidence_ranking)
+
+        # 2 divides the most spacings but is only ranked by one of the rankings
+        self.assertEqual([key_length for key_length, score in ranking], [6, 3, 2, 12])
+        self.assertAlmostEqual(ranking[0][1], 1 / 12 + 1 / 11)
+        self.assertAlmostEqual(ranking[2][1], 1 / 11)
+
+    def test_merge_rankings_breaks_ties_by_key_length(self):
+        ranking = coincidence.merge_rankings([(5, 1)], [(4, 1)], how_many=1)
+
+        self.assertEqual(ranking, [(4, 1 / 11)])
+
+    def test_rank_scores_puts_multiples_last(self):
+        scores = {1: 0.04, 2: 0.045, 3: 0.065, 6: 0.066}
+
+        self.assertEqual([key_length for key_length, score in coincidence.rank_scores(scores)], [3, 2, 1, 6])
+
+    def test_rank_key_lengths_leaves_out_short_columns(self):
+        # 87 letters enciphered with KLJ, too few for the columns of long key lengths to be scored
+        cipher_text = "KOVSDBSZWCPWYFPRWJCLPXLVOPCCUXRYTKWNYHWOOASNNBXXXDCBZDCEQOSJXVBRLFCSXYEBEYKKEQSYPZSXOYR"
+        key_lengths = [key_length for key_length, score in coincidence.rank_key_lengths(cipher_text)]
+
+        self.assertEqual(max(key_lengths), len(cipher_text) // coincidence.MIN_COLUMN_LETTERS)
+        self.assertIn(3, key_lengths[:2])
+
+
+if __name__ == "__main__":
+    unittest.main()
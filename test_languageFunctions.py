@@ -0,0 +1,17 @@
+import unittest
+import languageFunctions
+
+
+class UnspacedEnglishTest(unittest.TestCase):
+    def test_accepts_english(self):
+        self.assertTrue(languageFunctions.is_english("ABEAUTIFULYOUNGWOMANWITHUNUSUALLYBIGTHUMBS", spaces=False))
+
+    def test_rejects_short_words_found_by_chance(self):
+        # the 87 letter benchmark text enciphered with KLJ, deciphered with a wrong key of 33 letters
+        plaintext = "AALNNTSTASTNOAALEASAAOATEETTSAEESAIDTROOIEIRERSIRLTROOTTOEHAOTEERESENTOTESOAIHITATAOENC"
+
+        self.assertFalse(languageFunctions.is_english(plaintext, spaces=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,134 @@
+import heapq
 import string
+import time
+import attackScheduler
+import cipherText
+import coincidence
+import dictionarySearch
+import kasiski
 import languageFunctions
-from frequencyFinder import english_frequency_score
-from myMath import factors
+import metrics
+import ngramFitness
+import parallelAttack
+import resultCache
+import stagedFilter
+from frequencyFinder import chi_squared_shift_scores, shift_frequency_scores
+
+# Number of keys deciphered per call to decipher_batch by the attacks below
+BATCH_SIZE = 1024
+
+# Size of the first batch of a serial attack. Batches double in size from here up to BATCH_SIZE, so the first,
+# most likely keys of a best-first key list are checked without waiting for a full batch
+FIRST_BATCH_SIZE = 16
+
+# Number of characters decipher_file reads at a time
+STREAM_CHUNK_SIZE = 1 << 20
+
+# Number of keys find_possible_keys produces for a key length by default, the keys after them are never tried
+DEFAULT_MAX_KEYS = 1000
+
+# Number of letters deciphered and scored with every key when keys are ranked by n-gram fitness.
+# Only the best keys are then deciphered and scored in full
+FITNESS_WINDOW = 100
+
+# The window is stretched to cover at least this many periods of a long key, up to MAX_FITNESS_WINDOW letters.
+# On a window of only one or two periods, a key that is wrong in one position can outscore the right key
+FITNESS_WINDOW_PERIODS = 8
+MAX_FITNESS_WINDOW = 1000
+
+# Number of candidates rank_keys_by_fitness returns by default
+DEFAULT_RANKED_CANDIDATES = 10
+
+_UPPERCASE_BYTES = string.ascii_uppercase.encode("ascii")
+
+# One translation table per key letter. Deciphering a letter with key letter K is a rotation of the alphabet by
+# K's position, so every letter of a column encrypted with the same key letter is deciphered by a single translate()
+DECIPHER_TABLES = {}
+for _shift, _letter in enumerate(string.ascii_uppercase):
+    DECIPHER_TABLES[_letter] = bytes.maketrans(_UPPERCASE_BYTES,
+                                               _UPPERCASE_BYTES[26 - _shift:] + _UPPERCASE_BYTES[:26 - _shift])
+
+
+def prepare_cipher_text(cipher_text):
+    """
+    Function normalizes the cipher text once, so that it can be deciphered with many keys.
+    Key letters only advance on letters, so the letters are stored separately from the lengths of the words
+    that the spaces divide them into.
+
+    Args:
+        cipher_text: string to be prepared, or a cipherText.Ciphertext that is already normalized
+
+    Returns:
+        tuple: bytes of the uppercase letters of the text, and a tuple of the word lengths
+    """
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    return cipher_text.letters, cipher_text.word_lengths
+
+
+def decipher_letters(letters, key):
+    """
+    Function deciphers bytes of uppercase letters with a key.
+    Every column of letters sharing a key letter is deciphered with one translate() call.
+
+    Args:
+        letters: bytes of uppercase letters without spaces
+        key: string containing the key
+
+    Returns:
+        bytes: deciphered letters
+    """
+    key = key.upper()
+    key_length = len(key)
+    if key_length == 0:
+        raise ValueError("Key must contain at least one letter.")
+    plaintext = bytearray(len(letters))
+
+    for i in range(min(key_length, len(letters))):
+        plaintext[i::key_length] = letters[i::key_length].translate(DECIPHER_TABLES[key[i]])
+
+    return bytes(plaintext)
+
+
+def restore_spaces(letters, word_lengths):
+    """
+    Function puts the spaces removed by prepare_cipher_text back into deciphered letters
+
+    Args:
+        letters: bytes of deciphered letters
+        word_lengths: tuple of word lengths returned by prepare_cipher_text
+
+    Returns:
+        string: deciphered text with spaces
+    """
+    if len(word_lengths) == 1:
+        return letters.decode("ascii")
+
+    words = []
+    start = 0
+    for length in word_lengths:
+        words.append(letters[start:start + length])
+        start += length
+
+    return b" ".join(words).decode("ascii")
+
+
+def decipher_batch(cipher_text, keys):
+    """
+    Function deciphers the cipher text with every key in a batch.
+    The cipher text is normalized once for the whole batch.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext to be deciphered, or a tuple returned by prepare_cipher_text
+        keys: an iterable of strings, each a key
+
+    Returns:
+        list: a list of deciphered strings, one for each key, all of the same length
+    """
+    if not isinstance(cipher_text, tuple):
+        cipher_text = prepare_cipher_text(cipher_text)
+    letters, word_lengths = cipher_text
+
+    return [restore_spaces(decipher_letters(letters, key), word_lengths) for key in keys]
 
 
 def decipher_vigenere(cipher_text, key):
@@ -9,150 +136,417 @@ def decipher_vigenere(cipher_text, key):
     Function deciphers a standard Vigenere encrypted cipher text using a key
 
     Args:
-        cipher_text: string to be deciphered
+        cipher_text: string or cipherText.Ciphertext to be deciphered
         key: string containing the key
 
     Returns:
          string: deciphered cipher text
     """
-    cipher_text = languageFunctions.format_for_analysis(cipher_text)
+    return decipher_batch(cipher_text, [key])[0]
+
+
+def decipher_file(input_path, output_path, key, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Function deciphers a cipher text file into a plaintext file with a known key, one chunk at a time,
+    so memory use doesn't depend on the size of the file. The output is the same as that of decipher_vigenere:
+    the key position carries over from one chunk to the next, skipping spaces, and spaces at the start and end
+    of the text are left out.
+
+    Args:
+        input_path: path to the cipher text file
+        output_path: path to the plaintext file to be written
+        key: string containing the key
+        chunk_size: int, number of characters read at a time, defaults to STREAM_CHUNK_SIZE
+
+    Returns:
+        int: number of letters deciphered
+    """
     key = key.upper()
-    plaintext = []
-    key_index = 0
-    key_length = len(key)
-    alphabet_length = len(string.ascii_uppercase)
+    if len(key) == 0:
+        raise ValueError("Key must contain at least one letter.")
+    key_offset = 0
+    letter_count = 0
+    # spaces are only written once it's known that more letters follow them
+    pending_spaces = ""
+    started = False
+
+    with open(input_path, "r") as input_file, open(output_path, "w") as output_file:
+        while True:
+            chunk = input_file.read(chunk_size)
+            if chunk == "":
+                break
+
+            # keep the uppercase letters and spaces, the same way format_for_analysis does
+            chunk = cipherText.NOT_LETTER_OR_SPACE.sub("", chunk.upper())
+            if not started:
+                chunk = chunk.lstrip(" ")
+            body = chunk.rstrip(" ")
+            if body == "":
+                pending_spaces += chunk
+                continue
+
+            # body is already formatted, and may start with spaces that format_for_analysis would strip
+            words = body.split(" ")
+            letters = "".join(words).encode("ascii")
+            word_lengths = tuple(len(word) for word in words)
+            rotated_key = key[key_offset:] + key[:key_offset]
+            output_file.write(pending_spaces + restore_spaces(decipher_letters(letters, rotated_key), word_lengths))
+
+            key_offset = (key_offset + len(letters)) % len(key)
+            letter_count += len(letters)
+            pending_spaces = chunk[len(body):]
+            started = True
+
+    return letter_count
+
+
+def evaluate_keys(shared, keys):
+    """
+    Function deciphers the whole cipher text with a batch of keys and keeps the keys that produce English.
+    With filter stages, the keys are first run through the staged early-reject filter, and the start of a long
+    plaintext is checked before the whole of it.
+    Used directly for serial attacks, and by the worker processes of parallelAttack.
+
+    Args:
+        shared: tuple of the prepared cipher text returned by prepare_cipher_text, the spaces bool,
+            the stages used by stagedFilter.filter_keys, None to check every key on the whole text, and a
+            time.monotonic() deadline after which the rest of the batch is skipped, None for no deadline.
+            A batch of checks on a long text can take seconds, so the deadline is checked before every key
+        keys: a list of strings, each a key to be tried
 
-    for index in range(len(cipher_text)):
-        if cipher_text[index] == " ":
-            plaintext.append(" ")
+    Returns:
+        tuple: a list of (key, plaintext) tuples for every key that produced English plaintext,
+            and a list with the number of keys that entered and survived each stage, the English check included
+    """
+    prepared_text, spaces, stages, deadline = shared
+    letters = prepared_text[0]
+    candidates = []
+
+    with metrics.timed("english_checking"):
+        if stages is None:
+            survivor_counts = [len(keys)]
+            window = None
         else:
-            cipher_value = string.ascii_uppercase.index(cipher_text[index])
+            keys, survivor_counts = stagedFilter.filter_keys(letters, keys, decipher_letters, stages)
+            window = stagedFilter.ENGLISH_CHECK_WINDOW
+
+        checked = 0
+        for key, plaintext in zip(keys, decipher_batch(prepared_text, keys)):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            checked += 1
+            # the start of a long plaintext is checked first, so nearly right keys don't cost a check of the whole text
+            if window is not None and len(plaintext) > window and \
+                    not languageFunctions.is_english(plaintext[:window], spaces):
+                continue
+            if languageFunctions.is_english(plaintext, spaces):
+                candidates.append((key, plaintext))
+        survivor_counts.append(len(candidates))
+
+    if metrics.ENABLED:
+        # the keys the deadline cut off were never checked
+        metrics.add_keys("english_checking", survivor_counts[0] - (len(keys) - checked))
+        metrics.increment("keys_tried", survivor_counts[0])
+        metrics.increment("keys_rejected_by_filter", survivor_counts[0] - survivor_counts[-2])
+        metrics.increment("candidates_rejected", survivor_counts[-2] - survivor_counts[-1])
+        metrics.increment("candidates_accepted", survivor_counts[-1])
+
+    return candidates, survivor_counts
+
+
+def find_english_candidates(cipher_text, keys, spaces=True, workers=1, progress=None,
+                            stages=None, stage_counts=None, deadline=None):
+    """
+    Generator that tries keys in order and yields the ones that decipher the cipher text into English.
+    With more than one worker the keys are split across a process pool. Closing the generator cancels the
+    remaining work.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext to be deciphered
+        keys: an iterable of strings, each a key to be tried
+        spaces: bool saying whether the text contains spaces, defaults to True
+        workers: int, number of worker processes, defaults to 1. None uses every CPU
+        progress: optional function called with the number of keys tried so far
+        stages: optional sequence of (window, threshold) tuples for stagedFilter.filter_keys. The filter drops keys
+            on short prefixes of the plaintext, which can lose a right key whose prefix reads badly, so by default
+            every key is checked on the whole text. The dictionary attack passes stagedFilter.DEFAULT_STAGES
+        stage_counts: optional list, filled with the number of keys that entered the filter followed by
+            the number of survivors of each stage and of the English check
+        deadline: optional time.monotonic() value after which no more keys are tried
+
+    Yields:
+        tuple: the key and the plaintext of each candidate
+    """
+    shared = (prepare_cipher_text(cipher_text), spaces, stages, deadline)
+    if deadline is not None:
+        keys = _until_deadline(keys, deadline)
 
-            key_value = string.ascii_uppercase.index(key[key_index % key_length])
-            key_index += 1
+    if workers != 1:
+        chunk_results = parallelAttack.evaluate_in_parallel(evaluate_keys, shared, keys, workers, progress=progress)
+    else:
+        chunk_results = _evaluate_serially(evaluate_keys, shared, keys, progress)
 
-            index_plaintext = (cipher_value - key_value) % alphabet_length
+    for candidates, survivor_counts in chunk_results:
+        if stage_counts is not None:
+            if not stage_counts:
+                stage_counts.extend([0] * len(survivor_counts))
+            for i in range(len(survivor_counts)):
+                stage_counts[i] += survivor_counts[i]
+        yield from candidates
 
-            plaintext.append(string.ascii_uppercase[index_plaintext])
 
-    return "".join(plaintext)
+def _until_deadline(keys, deadline):
+    """
+    Generator passing keys on until the deadline, a time.monotonic() value, has passed.
+    Keys are taken from it a batch at a time, so an attack stops within one batch of the deadline.
+    """
+    for key in keys:
+        if time.monotonic() >= deadline:
+            return
+        yield key
 
 
-def dictionary_attack(cipher_text, spaces=True):
+def _evaluate_serially(evaluate, shared, keys, progress=None):
+    """
+    Generator evaluating batches of keys in this process, the serial counterpart of
+    parallelAttack.evaluate_in_parallel
+    """
+    keys_tried = 0
+    for key_batch in parallelAttack.split_into_chunks(keys, BATCH_SIZE, FIRST_BATCH_SIZE):
+        result = evaluate(shared, key_batch)
+        keys_tried += len(key_batch)
+        if progress is not None:
+            progress(keys_tried)
+        yield result
+
+
+def fitness_window(key_length):
+    """
+    Returns:
+        int: number of letters keys of a length are scored on by rank_keys_by_fitness, see FITNESS_WINDOW_PERIODS
+    """
+    return min(max(FITNESS_WINDOW, FITNESS_WINDOW_PERIODS * key_length), MAX_FITNESS_WINDOW)
+
+
+def score_keys(letters, keys):
+    """
+    Function deciphers the fitness window of every key of a batch, see fitness_window, and scores each result
+    with ngramFitness.score_letters.
+    Used directly for serial ranking, and by the worker processes of parallelAttack.
+
+    Args:
+        letters: bytes of uppercase letters without spaces, at least as many as the longest window
+        keys: a list of strings, each a key to be scored
+
+    Returns:
+        list: a list of (score, key) tuples, one for each key
+    """
+    table = ngramFitness.get_table()
+    with metrics.timed("fitness_scoring"):
+        scores = [(ngramFitness.score_letters(decipher_letters(letters[:fitness_window(len(key))], key), table), key)
+                  for key in keys]
+
+    if metrics.ENABLED:
+        metrics.add_keys("fitness_scoring", len(keys))
+        metrics.increment("keys_tried", len(keys))
+    return scores
+
+
+def rank_keys_by_fitness(cipher_text, keys, how_many=DEFAULT_RANKED_CANDIDATES, workers=1, progress=None,
+                         deadline=None):
+    """
+    Function ranks keys by how English the text they decipher is, instead of accepting every key over a threshold.
+    Keys repeating a shorter key are reduced to it and tried once, see minimal_period. Every key deciphers and
+    scores a window of the first letters only, covering several of its periods, see fitness_window.
+    The best keys of every key length are then scored on the whole text, which decides the final order,
+    so the right key can't be pushed out of the shortlist by longer keys that happen to fit the window better.
+
+    Args:
+        cipher_text: string or cipherText.Ciphertext to be deciphered
+        keys: an iterable of strings, each a key to be tried
+        how_many: int, number of candidates returned, defaults to DEFAULT_RANKED_CANDIDATES
+        workers: int, number of worker processes, defaults to 1. None uses every CPU
+        progress: optional function called with the number of keys scored so far
+        deadline: optional time.monotonic() value after which no more keys are scored, the keys scored
+            until then are ranked
+
+    Returns:
+        list: a list of (key, plaintext, score) tuples, the highest n-gram fitness first
+    """
+    prepared_text = prepare_cipher_text(cipher_text)
+    window = prepared_text[0][:MAX_FITNESS_WINDOW]
+    keys = _distinct_periods(keys)
+    if deadline is not None:
+        keys = _until_deadline(keys, deadline)
+
+    if workers != 1:
+        chunk_results = parallelAttack.evaluate_in_parallel(score_keys, window, keys, workers, progress=progress)
+    else:
+        chunk_results = _evaluate_serially(score_keys, window, keys, progress)
+
+    # only the best few keys of every length are kept while the others are scored, however many keys there are
+    shortlists = {}
+    for chunk in chunk_results:
+        for score, key in chunk:
+            shortlist = shortlists.setdefault(len(key), [])
+            if len(shortlist) < how_many:
+                heapq.heappush(shortlist, (score, key))
+            elif score > shortlist[0][0]:
+                heapq.heapreplace(shortlist, (score, key))
+    best_keys = [key for shortlist in shortlists.values() for score, key in shortlist]
+
+    ranked = []
+    for key, plaintext in zip(best_keys, decipher_batch(prepared_text, best_keys)):
+        ranked.append((key, plaintext, ngramFitness.score_text(plaintext)))
+    ranked.sort(key=lambda candidate: candidate[2], reverse=True)
+
+    return ranked[:how_many]
+
+
+def _distinct_periods(keys):
+    """
+    Generator reducing keys to their minimal_period and passing each of them on once
+    """
+    keys_seen = set()
+    for key in keys:
+        key = minimal_period(key)
+        if key in keys_seen:
+            if metrics.ENABLED:
+                metrics.increment("duplicate_keys_skipped")
+            continue
+        keys_seen.add(key)
+        yield key
+
+
+def confirm_candidates(candidates):
+    """
+    Function shows each key candidate to the user and asks whether the deciphering is done
+
+    Args:
+        candidates: an iterable of (key, plaintext) tuples
+
+    Returns:
+        tuple: the confirmed key and plaintext, or a tuple of Nones if the user confirmed none of them
+    """
+    for key, plaintext in candidates:
+        print("\nKey candidate: " + key)
+        print("Plaintext candidate:\n" + languageFunctions.find_words_in_nospace(plaintext))
+        while True:
+            response = input("\nPress C to continue looking for a key, or Enter to confirm the key choice: ")
+            if response == "":
+                return key, plaintext
+            if response.lower() == "c":
+                print("Looking for a new key...\n")
+                break
+
+    return None, None
+
+
+def dictionary_attack(cipher_text, spaces=True, workers=1, rank_by_fitness=False, constrained=True, deadline=None,
+                      progress=None):
     """
     Function performs a dictionary attack on the cipher text.
 
     Args:
-        cipher_text: string of text to be deciphered
+        cipher_text: string or cipherText.Ciphertext to be deciphered
         spaces: bool saying whether the text contains spaces, defaults to True
+        workers: int, number of worker processes, defaults to 1. None uses every CPU
+        rank_by_fitness: bool, if True every word is scored with rank_keys_by_fitness and the best ones are shown
+            first, instead of showing the words that pass the English threshold in dictionary order. Defaults to False
+        constrained: bool, if True the words consistent with the letter statistics of the cipher text's columns
+            are tried first, the most likely key lengths first, and unless rank_by_fitness is set the other words
+            only after them, see dictionarySearch.candidate_words. If False every word is tried, shortest first.
+            Defaults to True
+        deadline: optional time.monotonic() value after which no more words are tried
+        progress: optional function called with the number of words tried so far. By default the progress,
+            the throughput and the time left are printed with attackScheduler.print_progress
 
     Returns:
         tuple containing the key and the plaintext
         returns None, None if deciphering failed
     """
-    # Load the text and list of keys from the dictionary created by languageFunctions.py
-    cipher_text = languageFunctions.format_for_analysis(cipher_text)
-    key_list = list(languageFunctions.ENGLISH_DICTIONARY.keys())
-
-    # A dictionary attack takes a while, so the program tracks how deep into the dictionary it got so far
-    displayed_percent = 0
-
-    for key in key_list:
-        # Display how many % of the dictionary have we went through
-        curr_percent = int(key_list.index(key) / len(key_list) * 100)
-        if curr_percent > displayed_percent:
-            displayed_percent = curr_percent
-            print("Tried {:02}% of the words in the dictionary".format(displayed_percent))
-
-        # Try to decipher the text with a word from the dictionary
-        plaintext = decipher_vigenere(cipher_text, key)
-
-        # Check whether the resulting text is English and ask user for final confirmation whether deciphering is done
-        if languageFunctions.is_english(plaintext, spaces):
-            print("\nKey candidate: " + key)
-            print("Plaintext candidate:\n" + languageFunctions.find_words_in_nospace(plaintext))
-            while True:
-                response = input("\nPress C to continue looking for a key, or Enter to confirm the key choice: ")
-                if response == "":
-                    return key, plaintext
-                if response.lower() == "c":
-                    print("Looking for a new key...\n")
-                    break
+    # The words of the dictionary created by languageFunctions.py are used as keys
+    dictionary = languageFunctions.ENGLISH_DICTIONARY
+    # normalized once for the column statistics and every batch of words
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    length_counts = {}
+    if constrained:
+        # ranking by fitness scores every word it is given, so it only gets the words the screen keeps
+        key_list = dictionarySearch.candidate_words(cipher_text, dictionary, counts=length_counts,
+                                                    fallback=not rank_by_fitness)
+        words_total = attackScheduler.estimate_dictionary_words(cipher_text, dictionary)
+    else:
+        key_list = dictionary
+        words_total = len(dictionary)
+
+    # A dictionary attack can take a while, so the program reports how far it got and how long the rest should take
+    if progress is None:
+        progress = attackScheduler.ProgressTracker("dictionary", words_total, attackScheduler.print_progress)
+
+    if rank_by_fitness:
+        ranked = rank_keys_by_fitness(cipher_text, key_list, workers=workers, progress=progress, deadline=deadline)
+        key, plaintext = confirm_candidates((key, plaintext) for key, plaintext, score in ranked)
+    else:
+        # Check which words decipher the text into English and ask user for final confirmation whether deciphering
+        # is done. Most words are rejected by the staged filter after deciphering a short prefix of the text
+        stage_counts = []
+        candidates = find_english_candidates(cipher_text, key_list, spaces, workers, progress,
+                                             stagedFilter.DEFAULT_STAGES, stage_counts, deadline)
+        try:
+            key, plaintext = confirm_candidates(candidates)
+        finally:
+            candidates.close()
+
+        print("Words surviving each stage of the search: " + " -> ".join(str(count) for count in stage_counts))
+
+    if constrained:
+        print("Words consistent with the column statistics: {} of {} in the lengths searched".format(
+            sum(kept for total, kept in length_counts.values()), sum(total for total, kept in length_counts.values())))
+
+    if key is not None:
+        return key, plaintext
 
     # Return a tuple of Nones if the attack fails
+    if attackScheduler.seconds_left(deadline) <= 0:
+        print("The time budget of the dictionary attack ran out before every word was tried.")
     print("Failed to find a key using dictionary attack.")
     return None, None
 
 
-def find_likely_key_lengths(cipher_text, how_many=6):
+def find_likely_key_lengths(cipher_text, how_many=6, use_coincidence=False, cache=None):
     """
     Function takes a string of cipher text, performs Kasiski examination to find likely key lengths
-    and returns them as a list
+    and returns them as a list. See kasiski.rank_key_lengths for the ranking with scores.
 
     Args:
-        cipher_text: string of text to be analysed
+        cipher_text: string or cipherText.Ciphertext to be analysed
         how_many: int defining how many most likely keys should be returned, defaults to 6
+        use_coincidence: bool, if True the Kasiski ranking is merged with the index of coincidence ranking
+            of coincidence.rank_key_lengths, see coincidence.merge_with_kasiski. Defaults to False
+        cache: optional resultCache.ResultCache the key lengths are looked up in and stored to
 
     Returns:
          list: a list of integers denoting likely key lengths
     """
-    # Remove spaces and nonalpha chars from the text
-    text = languageFunctions.format_for_analysis(cipher_text, False)
-
-    # A dictionary that stores indexes of three to five character sequences appearing in the text
-    seq_dict = {}
-
-    # loops through character sequences of length 3, 4 and 5, and stores them in the dictionary.
-    # uses the sequences as keys, and indexes of sequences as values
-    for seq_length in range(3, 6):
-        for i in range(len(text) - seq_length + 1):
-            sequence = text[i:i + seq_length]
-            if sequence in seq_dict:
-                seq_dict[sequence].append(i)
-            else:
-                seq_dict[sequence] = [i]
-
-    spacing_set = set()
-
-    # goes through all the sequences in the seq_dict, removes those that only appear once,
-    # then adds the spacings between the remainder to the spacing_set
-    for key in seq_dict:
-        if len(seq_dict[key]) == 1:
-            continue
-        for i in range(len(seq_dict[key]) - 1):
-            for j in range(i + 1, len(seq_dict[key])):
-                spacing_set.add(seq_dict[key][j] - seq_dict[key][i])
-
-    factor_count_dict = {}
-
-    # for each spacing in the spacing set the function takes it's factors and stores them in the factor_count_dict
-    # the keys in the dictionary are the factors, the values are the counts. Most numerous factors are most likely to be
-    # the key length
-    # function discards factors of 1
-    for spacing in spacing_set:
-        for factor in factors(spacing):
-            if factor == 1:
-                continue
-            if factor in factor_count_dict:
-                factor_count_dict[factor] += 1
-            else:
-                factor_count_dict[factor] = 1
-
-    likely_key_lengths = []
-
-    # create a list of tuples, where each tuple is a factor and its count
-    for key in factor_count_dict:
-        likely_key_lengths.append((key, factor_count_dict[key]))
-
-    # sort the list by count in descending order
-    likely_key_lengths.sort(key=lambda t: t[1], reverse=True)
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    if cache is not None:
+        key_lengths = cache.get(resultCache.KEY_LENGTHS, cipher_text, (how_many, use_coincidence))
+        if key_lengths is not None:
+            return key_lengths
+
+    with metrics.timed("key_length_search"):
+        if use_coincidence:
+            scores = dict(coincidence.rank_key_lengths(cipher_text))
+            ranking = coincidence.merge_with_kasiski(kasiski.rank_key_lengths(cipher_text), scores, how_many)
+        else:
+            ranking = kasiski.rank_key_lengths(cipher_text, how_many)
 
-    # strip the counts from the tuples, turning the list of tuples into a list of ints, sorted by count
-    for i in range(min(how_many, len(likely_key_lengths))):
-        likely_key_lengths[i] = likely_key_lengths[i][0]
+    # strip the scores from the ranking, turning the list of tuples into a list of ints, sorted by score
+    key_lengths = [key_length for key_length, score in ranking]
 
-    # returns a list of n most likely lengths of the key, n equal to how_many, defaults to 6
-    return likely_key_lengths[:min(how_many, len(likely_key_lengths))]
+    if cache is not None:
+        cache.put(resultCache.KEY_LENGTHS, cipher_text, key_lengths, (how_many, use_coincidence))
+    return key_lengths
 
 
 def get_every_nth_letter(cipher_text, n):
@@ -164,130 +558,231 @@ def get_every_nth_letter(cipher_text, n):
         ["ADG", "BEH", "CFI")
 
     Args:
-        cipher_text: string of text to be divided into substrings
+        cipher_text: string or cipherText.Ciphertext to be divided into substrings
         n: number of strings to output
 
     Returns:
          list: a list with n elements, each a string made by taking every nth character
     """
-    text = languageFunctions.format_for_analysis(cipher_text, False)
-    list_of_strings = []
+    # the columns are sliced from the letters once and kept by the Ciphertext
+    return [column.decode("ascii") for column in cipherText.as_ciphertext(cipher_text).columns(n)]
 
-    i = 0
-    while i < n:
-        list_of_strings.append([])
-        i += 1
 
-    # Function uses lists and later joins them into strings for speed
-    for i in range(len(text)):
-        list_of_strings[i % n].append(text[i])
+def enumerate_keys(ranked_letters, max_keys=None):
+    """
+    Generator that builds keys from per-position letter rankings, best combined score first. For example:
+        enumerate_keys([[('A', 1), ('B', 2)], [('D', 1)], [('E', 1), ('F', 5)]])
+    would yield:
+        "ADE", "BDE", "ADF", "BDF"
+    Keys are produced one at a time from a heap of the cheapest unvisited combinations, so testing can start
+    straight away and memory stays bounded no matter how many combinations there are.
+    The cost of a key is the sum of how much worse each of its letters scores than the best letter of its position.
 
-    for i in range(len(list_of_strings)):
-        list_of_strings[i] = "".join(list_of_strings[i])
+    Args:
+        ranked_letters: a list with a list of (letter, score) tuples for every key position, each sorted from the
+            best to the worst score, as returned by rank_key_letters. The lower the score, the better
+        max_keys: optional int, the most keys to yield, by default every combination is yielded
 
-    return list_of_strings
+    Yields:
+        string: the next best key
+    """
+    key_length = len(ranked_letters)
+    if key_length == 0:
+        return
+
+    # Every heap entry is the cost of a key, the index of the chosen letter at each position, and the first position
+    # that may still be moved to a worse letter. Only moving positions from that one onwards means every
+    # combination is pushed onto the heap exactly once
+    heap = [(0, (0,) * key_length, 0)]
+    keys_yielded = 0
+    # only the time spent building keys is recorded, not the time the caller spends between them
+    timed = metrics.ENABLED
+
+    while heap and (max_keys is None or keys_yielded < max_keys):
+        if timed:
+            start_time = time.perf_counter()
+        cost, indices, first_position = heapq.heappop(heap)
+        key = "".join(ranked_letters[position][index][0] for position, index in enumerate(indices))
+
+        for position in range(first_position, key_length):
+            index = indices[position] + 1
+            if index < len(ranked_letters[position]):
+                next_cost = cost + ranked_letters[position][index][1] - ranked_letters[position][index - 1][1]
+                next_indices = indices[:position] + (index,) + indices[position + 1:]
+                heapq.heappush(heap, (next_cost, next_indices, position))
+
+        if timed:
+            metrics.add_time("candidate_enumeration", time.perf_counter() - start_time)
+        yield key
+        keys_yielded += 1
+
+
+def rank_key_letters(cipher_text, key_length, use_etaoin_score=False, cache=None):
+    """
+    Function slices the cipher text into substrings equal to length of key, and treats each substring as a standard
+    Caesar cipher. The letters of each substring are counted once, and every letter of the alphabet is scored as
+    its key letter with frequencyFinder.chi_squared_shift_scores, without deciphering the substring.
 
+    Args:
+        cipher_text: string or cipherText.Ciphertext to be deciphered, or any other text with a column_histograms
+            method, such as multiMessage.MessageSet. Only a string or Ciphertext can be cached
+        key_length: int, length of key with which the cipher text is encoded
+        use_etaoin_score: bool, if True letters are scored with the coarser frequencyFinder.english_frequency_score
+            instead, as 12 minus the score so that lower is still better. Defaults to False
+        cache: optional resultCache.ResultCache the rankings are looked up in and stored to
 
-def produce_permutations(list_of_key_lists):
+    Returns:
+        list: a list with a list for every key position, holding (letter, score) tuples for all 26 letters,
+            sorted from the most to the least likely key letter. The lower the score, the closer to English
     """
-    A recursive function that takes a list of lists of characters, and creates all possible combinations of words
-    using them, and outputs them in a string. For example:
-        produce_permutations([['A', 'B', 'C'], ['D'], ['E', 'F']])
-    would output:
-        ["ADE", "ADF", "BDE", "BDF", "CDE", "CDF"]
+    if cache is not None:
+        ranked_letters = cache.get(resultCache.RANKED_LETTERS, cipher_text, (key_length, use_etaoin_score))
+        if ranked_letters is not None:
+            # JSON stores the tuples as lists
+            return [[tuple(letter_score) for letter_score in position] for position in ranked_letters]
+
+    cipher_text = _as_analysed_text(cipher_text)
+    ranked_letters = rank_histogram_letters(cipher_text.column_histograms(key_length), use_etaoin_score)
+
+    if cache is not None:
+        cache.put(resultCache.RANKED_LETTERS, cipher_text, ranked_letters, (key_length, use_etaoin_score))
+    return ranked_letters
+
+
+def rank_histogram_letters(histograms, use_etaoin_score=False):
+    """
+    Function ranks the key letters of every column from the column's letter histogram, see rank_key_letters
 
     Args:
-        list_of_key_lists: a list of lists, each inner list holds all the possible characters to be used at a given
-        position in the
+        histograms: a list of 26 letter counts for every key position
+        use_etaoin_score: bool, if True letters are scored with frequencyFinder.english_frequency_score instead
 
     Returns:
-         A list of strings, each composed of characters from sublists in the list provided as argument
+        list: a list with a list for every key position, holding (letter, score) tuples for all 26 letters,
+            sorted from the most to the least likely key letter
     """
-    # base case: if length of list is 1, return the list
-    if len(list_of_key_lists) == 1:
-        return list_of_key_lists[0]
-    # if the list is longer than 1, take characters from first sublist, and append the function's call to itself,
-    # omitting the first sublist
-    else:
-        key_list = []
-        for char_a in list_of_key_lists[0]:
-            for char_b in produce_permutations(list_of_key_lists[1:]):
-                key_list.append(char_a + char_b)
-        return key_list
+    ranked_letters = []
+
+    with metrics.timed("column_solving"):
+        for histogram in histograms:
+            if use_etaoin_score:
+                scores = [12 - score for score in shift_frequency_scores(histogram)]
+            else:
+                scores = chi_squared_shift_scores(histogram)
+            ranked_letters.append(sorted(zip(string.ascii_uppercase, scores), key=lambda t: t[1]))
+
+    return ranked_letters
 
 
-def find_possible_keys(cipher_text, key_length):
+def find_possible_keys(cipher_text, key_length, max_keys=DEFAULT_MAX_KEYS, cache=None):
     """
     Function slices the cipher text into substrings equal to length of key, and then treats each substring as a standard
     Caesar cipher.
-    Each Caesar cipher is brute forced with every letter of the alphabet, then the character frequency distribution
-    in each brute force attempt is analysed and compared with English distribution. The keys that lead to
-    "most English" distributions are returned in a list
+    Every letter of the alphabet is scored as the key of each Caesar cipher by comparing the letter distribution
+    it would decipher into with the English distribution, see rank_key_letters. Keys are then built from
+    the "most English" letters first, see enumerate_keys.
+    Unlike the list this used to return, the keys are produced lazily and only the best DEFAULT_MAX_KEYS (1000) of
+    them by default, every key after that is left out. Pass max_keys=None for every combination of letters, and wrap
+    the result in list() to take its len() or index it.
 
     Args:
-        cipher_text: string of text to be deciphered
+        cipher_text: string or cipherText.Ciphertext to be deciphered, or any other text rank_key_letters accepts
         key_length: int, length of key with which the cipher text is encoded
+        max_keys: optional int, the most keys to produce, defaults to DEFAULT_MAX_KEYS. None produces every key,
+            26 ** key_length of them
+        cache: optional resultCache.ResultCache the letter rankings are looked up in and stored to
 
     Returns:
-        list: a list of strings, each a potential key that leads to an English-like distribution of letters.
+        generator: yields strings, each a potential key, those leading to the most English-like distributions
+            of letters first, at most max_keys of them
+    """
+    return enumerate_keys(rank_key_letters(cipher_text, key_length, cache=cache), max_keys)
+
+
+def minimal_period(key):
     """
+    Function reduces a key that repeats a shorter key to the shorter key, for example "ABCABC" to "ABC".
+    Both decipher every text the same way, so only one of them needs to be tried.
 
-    text = languageFunctions.format_for_analysis(cipher_text, False)
-    substring_list = get_every_nth_letter(text, key_length)
-    alphabet = string.ascii_uppercase
+    Args:
+        key: string
 
-    list_of_key_lists = []
+    Returns:
+        string: the shortest key that key repeats, key itself if it doesn't repeat one
+    """
+    # a string is found inside itself doubled before its own length only at multiples of the shorter string it repeats
+    period = (key + key).find(key, 1)
+    return key[:period]
 
-    for i in range(key_length):
 
-        key_list = list()
-        highest_match_score = 0
-        substring = substring_list[i]
+def find_keys_for_lengths(cipher_text, key_lengths, max_keys=DEFAULT_MAX_KEYS, cache=None):
+    """
+    Generator producing the keys of find_possible_keys for several key lengths in turn, reduced to their
+    minimal_period, and each of them once. Likely key lengths are often multiples of each other, and the best keys
+    of a multiple are mostly the best key of the shorter length repeated, so without this they would be
+    deciphered and checked again.
+    The column histograms of the longest lengths are counted first, so the histograms of their divisors are added
+    up from them instead of being counted again, see cipherText.Ciphertext.column_histograms.
 
-        for letter in alphabet:
-            freq_score = english_frequency_score(decipher_vigenere(substring, letter))
-            if freq_score > highest_match_score:
-                highest_match_score = freq_score
-                key_list.clear()
-                key_list.append(letter)
-            elif freq_score == highest_match_score:
-                key_list.append(letter)
-        list_of_key_lists.append(key_list)
+    Args:
+        cipher_text: string or cipherText.Ciphertext to be deciphered, or any other text rank_key_letters accepts,
+            such as multiMessage.MessageSet and incrementalAnalysis.StreamAnalyzer
+        key_lengths: a list of ints, the key lengths in the order they are tried
+        max_keys: optional int, the most keys produced for each key length, defaults to DEFAULT_MAX_KEYS
+        cache: optional resultCache.ResultCache the letter rankings are looked up in and stored to
+
+    Yields:
+        string: the next key
+    """
+    cipher_text = _as_analysed_text(cipher_text)
+    for key_length in sorted(set(key_lengths), reverse=True):
+        cipher_text.column_histograms(key_length)
 
-    list_of_keys = produce_permutations(list_of_key_lists)
+    yield from _distinct_periods(key for key_length in key_lengths
+                                 for key in find_possible_keys(cipher_text, key_length, max_keys, cache))
 
-    return list_of_keys
 
+def _as_analysed_text(cipher_text):
+    """
+    Function returns a text that already counts its own column histograms unchanged, and normalizes a string into
+    a cipherText.Ciphertext
+    """
+    if hasattr(cipher_text, "column_histograms"):
+        return cipher_text
+    return cipherText.as_ciphertext(cipher_text)
 
-def brute_force_with_list(cipher_text, list_of_keys, spaces=True):
+
+def brute_force_with_list(cipher_text, list_of_keys, spaces=True, workers=1, rank_by_fitness=False, deadline=None):
     """
     Function takes a cipher text and a list of keys, then tries each key until a solution in English is found.
 
     Args:
-        cipher_text: string, the text to be deciphered
-        list_of_keys: a list of strings, where each string is a key to be tried
+        cipher_text: string or cipherText.Ciphertext, the text to be deciphered
+        list_of_keys: a list or any other iterable of strings, where each string is a key to be tried.
+            Keys are taken from it as they are needed, so it can be a generator such as find_possible_keys
         spaces: optional bool, denotes whether cipher_text has spaces. Defaults to True.
+        workers: optional int, number of worker processes. Defaults to 1, None uses every CPU.
+        rank_by_fitness: optional bool, if True all keys are ranked with rank_keys_by_fitness and the best ones
+            are shown first, instead of the keys passing the English threshold in list order. Defaults to False.
+        deadline: optional time.monotonic() value after which no more keys are tried. Defaults to None.
 
     Returns:
         tuple: a tuple of two strings, the first one being the key, second one the plaintext.
             returns a tuple of Nones if no solution is found.
     """
-    text = languageFunctions.format_for_analysis(cipher_text)
-    key_list = list_of_keys
-
-    for key in key_list:
-        plaintext = decipher_vigenere(text, key)
-
-        if languageFunctions.is_english(plaintext, spaces):
-            print("Key candidate: " + key)
-            print("Plaintext candidate:\n" + languageFunctions.find_words_in_nospace(plaintext))
-            while True:
-                response = input("\nPress C to continue looking for a key, or Enter to confirm the key choice: ")
-                if response == "":
-                    return key, plaintext
-                if response.lower() == "c":
-                    print("Looking for a new key...\n")
-                    break
+    cipher_text = cipherText.as_ciphertext(cipher_text)
+    if rank_by_fitness:
+        ranked = rank_keys_by_fitness(cipher_text, list_of_keys, workers=workers, deadline=deadline)
+        key, plaintext = confirm_candidates((key, plaintext) for key, plaintext, score in ranked)
+    else:
+        candidates = find_english_candidates(cipher_text, list_of_keys, spaces, workers, deadline=deadline)
+        try:
+            key, plaintext = confirm_candidates(candidates)
+        finally:
+            candidates.close()
+
+    if key is not None:
+        return key, plaintext
 
     print("Failed to find a key using frequency analysis.")
     return None, None